@@ -0,0 +1,297 @@
+import time
+import math
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import metrics
+
+MAX_DENEME = 4
+BEKLEME_TABAN_SN = 1.0
+BEKLEME_TAVAN_SN = 30.0
+MAX_RETRY_AFTER_SN = 120.0
+VARSAYILAN_ISTEK_HIZI = None
+HIZ_ORNEK_SAYISI = 50
+KISMA_ARALIGI_SN = 1.0
+MAX_BEKLEME_ADIMI_SN = 1.0
+YENIDEN_DENENECEK_KODLAR = (408, 425, 429, 500, 502, 503, 504)
+ZAMAN_ASIMI_SN = 90.0
+MIN_ZAMAN_ASIMI_SN = 15.0
+MAX_ZAMAN_ASIMI_SN = 300.0
+BAGLANTI_ZAMAN_ASIMI_SN = 10.0
+ZAMAN_ASIMI_CARPANI = 4.0
+GECIKME_PENCERESI = 200
+MIN_GECIKME_ORNEGI = 20
+VARSAYILAN_YEDEK_BUTCESI = 0.05
+YEDEK_BUTCE_TAVANI = 5.0
+
+class RequestCancelled(Exception):
+    pass
+
+class RateLimiter:
+    # Without a configured rate nothing is held back until the API answers 429; the rate then starts at
+    # half of what was being sent, and climbs back until the limiter is uncapped again.
+    def __init__(self, rate=VARSAYILAN_ISTEK_HIZI, burst=None, min_rate=0.1):
+        self.max_rate = float(rate) if rate else None
+        self.rate = self.max_rate
+        self.min_rate = min(float(min_rate), self.max_rate or float(min_rate))
+        self.burst = burst
+        self.capacity = float(burst or max(1.0, self.rate or 1.0))
+        self.tokens = self.capacity
+        self.ceiling = None
+        self.last_cut = 0.0
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.sent = deque(maxlen=HIZ_ORNEK_SAYISI)
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        if self.rate is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _observed_rate(self, now):
+        if len(self.sent) < 2 or now <= self.sent[0]:
+            return None
+        return (len(self.sent) - 1) / (now - self.sent[0])
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.rate is None:
+                    self.sent.append(now)
+                    return
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    self.sent.append(now)
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            # Woken at least once a second, so a rate that recovers meanwhile is picked up.
+            time.sleep(min(wait, MAX_BEKLEME_ADIMI_SN))
+
+    def on_throttled(self, retry_after=None):
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self.rate is None:
+                self.ceiling = self._observed_rate(now) or 1.0
+                self.rate = self.ceiling
+                self.capacity = float(self.burst or max(1.0, self.rate))
+            # A burst of 429s from requests that were already in flight counts as a single signal.
+            if now - self.last_cut >= KISMA_ARALIGI_SN:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.last_cut = now
+            self.tokens = 0.0
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+    def on_success(self):
+        with self.lock:
+            if self.rate is None:
+                return
+            limit = self.max_rate or self.ceiling
+            if self.rate < limit:
+                self._refill(time.monotonic())
+                self.rate = min(limit, self.rate + limit * 0.05)
+            elif self.max_rate is None:
+                self.rate = None
+
+class LatencyTracker:
+    # Successful request times with their payload sizes; a percentile is scaled up for payloads larger than the typical one.
+    def __init__(self, window=GECIKME_PENCERESI, min_samples=MIN_GECIKME_ORNEGI):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+
+    def observe(self, seconds, size):
+        with self.lock:
+            self.samples.append((seconds, size))
+
+    def scaled_percentile(self, percentile, size):
+        with self.lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            latencies = sorted(seconds for seconds, _ in self.samples)
+            sizes = sorted(sample_size for _, sample_size in self.samples)
+        value = latencies[min(len(latencies) - 1, max(0, math.ceil(percentile / 100 * len(latencies)) - 1))]
+        typical = sizes[len(sizes) // 2]
+        return value * max(1.0, size / typical) if typical else value
+
+    def timeout_for(self, size):
+        value = self.scaled_percentile(99, size)
+        if value is None:
+            return ZAMAN_ASIMI_SN
+        return min(max(value * ZAMAN_ASIMI_CARPANI, MIN_ZAMAN_ASIMI_SN), MAX_ZAMAN_ASIMI_SN)
+
+class Hedger:
+    # A second copy of a slow request is sent once it passes the given percentile; every request earns
+    # `budget` of a hedge, so speculative copies stay within that fraction of the traffic (and credits).
+    def __init__(self, percentile, budget=VARSAYILAN_YEDEK_BUTCESI, workers=10):
+        self.percentile = float(percentile)
+        self.budget = float(budget)
+        self.tokens = 1.0
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max(4, int(workers) * 2))
+
+    def earn(self):
+        with self.lock:
+            self.tokens = min(YEDEK_BUTCE_TAVANI, self.tokens + self.budget)
+
+    def take(self):
+        with self.lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+    def run(self, send, size, tracker, stats):
+        self.earn()
+        delay = tracker.scaled_percentile(self.percentile, size)
+        if delay is None:
+            return send(None)
+        cancels = {}
+        primary_cancel = threading.Event()
+        primary = self.executor.submit(send, primary_cancel)
+        cancels[primary] = primary_cancel
+        if wait([primary], timeout=delay).done or not self.take():
+            return primary.result()
+        stats.add('hedged')
+        hedge_cancel = threading.Event()
+        hedge = self.executor.submit(send, hedge_cancel)
+        cancels[hedge] = hedge_cancel
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and future.result()[0].ok:
+                    # The loser stops retrying; a reply it is still waiting for is dropped when it arrives.
+                    for other in pending:
+                        cancels[other].set()
+                        other.cancel()
+                    if future is hedge:
+                        stats.add('hedge_wins')
+                    return future.result()
+        return primary.result()
+
+_session = None
+_limiter = None
+_pool_size = 10
+_adaptive_timeouts = True
+_latency = LatencyTracker()
+_hedger = None
+_state_lock = threading.Lock()
+
+def configure(rate=None, pool_size=None, adaptive_timeouts=None, hedge_percentile=None, hedge_budget=None):
+    global _session, _limiter, _pool_size, _adaptive_timeouts, _hedger
+    with _state_lock:
+        if pool_size and int(pool_size) != _pool_size:
+            _pool_size = int(pool_size)
+            if _session is not None:
+                _session.close()
+                _session = None
+        if rate:
+            _limiter = RateLimiter(rate)
+        if adaptive_timeouts is not None:
+            _adaptive_timeouts = bool(adaptive_timeouts)
+        if hedge_percentile:
+            _hedger = Hedger(hedge_percentile, VARSAYILAN_YEDEK_BUTCESI if hedge_budget is None else hedge_budget, _pool_size)
+
+def request_timeout(size):
+    read_timeout = _latency.timeout_for(size) if _adaptive_timeouts else ZAMAN_ASIMI_SN
+    return (BAGLANTI_ZAMAN_ASIMI_SN, read_timeout)
+
+def hedged(send, size):
+    if _hedger is None:
+        return send(None)
+    return _hedger.run(send, size, _latency, metrics.get_metrics())
+
+def get_session():
+    global _session
+    with _state_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=_pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+def get_rate_limiter():
+    global _limiter
+    with _state_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER_SN)
+
+def backoff_delay(attempt):
+    cap = min(BEKLEME_TAVAN_SN, BEKLEME_TABAN_SN * (2 ** attempt))
+    return random.uniform(cap / 2, cap)
+
+def post_image(url, headers, filename, data, mime_type, timeout=None, max_attempts=MAX_DENEME, image=None, limiter=None, cancel=None):
+    import requests
+    session = get_session()
+    limiter = limiter or get_rate_limiter()
+    stats = metrics.get_metrics()
+    for attempt in range(max_attempts):
+        last_attempt = attempt == max_attempts - 1
+        if cancel is not None and cancel.is_set():
+            raise RequestCancelled(filename)
+        with stats.timer('rate_limit', image):
+            limiter.acquire()
+        stats.add('requests')
+        stats.add('bytes_uploaded', len(data))
+        started = time.perf_counter()
+        try:
+            response = session.post(url, headers=headers, files={"file": (filename, data, mime_type)}, timeout=timeout or request_timeout(len(data)))
+        except (requests.ConnectionError, requests.Timeout) as e:
+            stats.observe('api', time.perf_counter() - started, image)
+            if isinstance(e, requests.Timeout):
+                stats.add('timeouts')
+            if last_attempt:
+                e.attempts = max_attempts
+                raise
+            stats.add('retries')
+            with stats.timer('backoff', image):
+                time.sleep(backoff_delay(attempt))
+            continue
+        total = time.perf_counter() - started
+        waited = min(total, response.elapsed.total_seconds())
+        stats.observe('api', waited, image)
+        stats.observe('download', total - waited, image)
+        stats.add('bytes_downloaded', len(response.content))
+
+        if response.status_code in YENIDEN_DENENECEK_KODLAR and not last_attempt:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if response.status_code == 429:
+                stats.add('throttled')
+                limiter.on_throttled(retry_after)
+            stats.add('retries')
+            with stats.timer('backoff', image):
+                time.sleep(retry_after if retry_after is not None else backoff_delay(attempt))
+            continue
+
+        if response.ok:
+            limiter.on_success()
+            _latency.observe(total, len(data))
+        return response, attempt + 1
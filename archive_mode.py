@@ -6,7 +6,18 @@ import json
 from dotenv import load_dotenv
 import core_logic
 import configparser
+import shutil
 import tempfile
+import job_journal
+import key_pool
+import metrics
+import failures
+import scan_index
+import formats
+import output_encoder
+
+ARCHIVE_WORK_DIR = ".archive_work"
+ARCHIVE_OUTPUT_DIR = "archive_outputs"
 
 def save_profile(profile_data):
     with open('profile.json', 'w', encoding='utf-8') as f:
@@ -14,26 +25,145 @@ def save_profile(profile_data):
 
 def find_all_archives(root_folder, lang):
     print(lang.get('INFO_SCANNING_ARCHIVES', '...'), end='', flush=True)
-    archive_paths = []
-    supported_exts = ('.pdf', '.cbz', '.cbr', '.cb7', '.epub', '.zip', '.rar', '.7z')
-    for root, dirs, files in os.walk(root_folder):
-        dirs[:] = [d for d in dirs if not d.startswith('.') and 'lang' not in d and '_output' not in d and 'error' not in d]
-        for file in files:
-            if file.lower().endswith(supported_exts):
-                archive_paths.append(os.path.join(root, file))
+    archive_paths = scan_index.get_index().walk(root_folder, formats.extensions(), _skip_archive_dir)
     print(" Tamamlandı.")
-    return archive_paths
+    return core_logic.sorted_alphanumeric(archive_paths)
+
+def _skip_archive_dir(name):
+    return name.startswith('.') or 'lang' in name or '_output' in name or 'error' in name
+
+def can_resume(journal):
+    return journal.extracted is not None and os.path.isdir(journal.header['work_dir'] or '')
+
+def find_resumable_archive_job(filepath, model, target_lang):
+    journal = job_journal.find_incomplete('archive', filepath, model, target_lang)
+    if journal is not None and not can_resume(journal):
+        return None
+    return journal
+
+def prepare_archive_job(filepath, model, target_lang, lang, journal=None, skip_blank=True, skip_duplicates=True):
+    file_ext = os.path.splitext(filepath)[1].lower()
+    base_name = os.path.splitext(os.path.basename(filepath))[0]
+    resuming = journal is not None
+    handler = formats.for_extension(file_ext)
+    if handler is None:
+        print(f"Desteklenmeyen dosya formatı: {file_ext}"); return None
+
+    if resuming:
+        journal.repair()
+        work_dir = journal.header['work_dir']
+        extract_dir = os.path.join(work_dir, "extracted")
+        print(lang.get('INFO_RESUMING_JOB', '...').format(work_dir=work_dir))
+    else:
+        os.makedirs(ARCHIVE_WORK_DIR, exist_ok=True)
+        work_dir = tempfile.mkdtemp(prefix=f"{base_name}_{time.strftime('%Y%m%d_%H%M%S')}_", dir=ARCHIVE_WORK_DIR)
+        extract_dir = os.path.join(work_dir, "extracted")
+        os.makedirs(extract_dir)
+        if not handler.streaming:
+            print(lang.get('INFO_EXTRACTING', '...').format(filename=os.path.basename(filepath)))
+            try:
+                with metrics.get_metrics().timer('extract'): handler.extract(filepath, extract_dir)
+            except Exception as e:
+                print(f"Dosya çıkarılırken hata oluştu: {e}"); shutil.rmtree(work_dir, ignore_errors=True); return None
+        journal = job_journal.JobJournal.create('archive', filepath, model, target_lang, None, work_dir=work_dir)
+        journal.mark_extracted()
+
+    job = {'filepath': filepath, 'file_ext': file_ext, 'base_name': base_name, 'work_dir': work_dir, 'extract_dir': extract_dir, 'journal': journal, 'resuming': resuming}
+    failures.register_job(os.path.join(extract_dir, "error"), journal)
+    try:
+        # A resumed job already knows its pages; only a fresh one has to list the archive.
+        job['page_names'] = core_logic.sorted_alphanumeric(journal.states) if journal.states else core_logic.list_archive_images(filepath, file_ext, extract_dir)
+    except Exception as e:
+        print(f"Dosya çıkarılırken hata oluştu: {e}")
+        if not resuming: discard_archive_job(job)
+        return None
+    print(lang.get('INFO_EXTRACTING_SUCCESS', '...').format(count=len(job['page_names'])))
+    journal.add_images(job['page_names'])
+    job['plan'] = core_logic.plan_archive_pages(filepath, file_ext, extract_dir, pending_archive_pages(job), skip_blank, skip_duplicates)
+    job['tiles'] = core_logic.plan_archive_requests(filepath, file_ext, extract_dir, [name for name in pending_archive_pages(job) if name not in job['plan']])
+    return job
+
+def pending_archive_pages(job):
+    return [name for name in job['page_names'] if job['journal'].get_state(name) != job_journal.CEVRILDI]
+
+def discard_archive_job(job):
+    job['journal'].discard()
+    shutil.rmtree(job['work_dir'], ignore_errors=True)
+
+def run_archive_job(job, api_key, model, target_lang, profile, lang, max_workers, cache=None, executor=None, output_dir=ARCHIVE_OUTPUT_DIR, only=None):
+    started = time.time()
+    journal = job['journal']
+    translated_folder = os.path.join(job['work_dir'], "translated")
+    os.makedirs(translated_folder, exist_ok=True)
+    error_folder = os.path.join(job['extract_dir'], "error")
+
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    os.makedirs(output_dir, exist_ok=True)
+    handler = formats.for_extension(job['file_ext'])
+    page_writer, output_filename = handler.create_writer(job['filepath'], job['file_ext'], output_dir, timestamp, profile.get('keep_archive_format', False)) if handler.can_repack else (None, None)
+
+    output_encoder.pin_format(translated_folder, getattr(page_writer, 'image_formats', None))
+    try:
+        core_logic.translate_archive_stream(job['filepath'], job['file_ext'], job['extract_dir'], job['page_names'], api_key, model, target_lang, translated_folder, error_folder, lang, max_workers, cache, journal, page_writer.add if page_writer else None, executor, job['plan'], only)
+    except BaseException:
+        if page_writer: page_writer.abort()
+        raise
+    finally:
+        output_encoder.unpin_format(translated_folder)
+        handler.release(job['filepath'])
+
+    summary = {
+        'source': job['filepath'],
+        'kind': 'archive',
+        'pages': len(job['page_names']),
+        'translated': journal.count(job_journal.CEVRILDI),
+        'failed': journal.count(job_journal.BASARISIZ),
+        'skipped': len(job['plan']),
+        'requests': core_logic.count_requests([name for name, state in journal.states.items() if state == job_journal.CEVRILDI and name not in job['plan']], job['tiles']),
+        'output': None,
+        'status': 'repack_failed',
+    }
+    repack_success = False
+    try:
+        if page_writer is not None:
+            print(lang.get('INFO_REPACKING', '...').format(output_filename=os.path.basename(output_filename)))
+            with metrics.get_metrics().timer('repack'):
+                page_writer.close()
+            repack_success = True
+        
+        if repack_success: print(lang.get('INFO_REPACKING_SUCCESS', '...'))
+    except Exception as e:
+        print(f"Dosya yeniden paketlenirken bir hata oluştu: {e}")
+
+    summary['seconds'] = round(time.time() - started, 2)
+    if not repack_success:
+        print(lang.get('INFO_WORK_DIR_KEPT', '...').format(work_dir=job['work_dir']))
+        return summary
+    if summary['failed']:
+        # Failed pages are re-driven from the kept work dir instead of re-extracting the archive.
+        print(lang.get('INFO_FAILED_PAGES_KEPT', '...').format(count=summary['failed'], work_dir=job['work_dir']))
+        summary.update(output=output_filename, status='done')
+        return summary
+
+    journal.complete()
+    scan_index.get_index().mark_translated([job['filepath']])
+    print(f"\n{lang.get('INFO_CLEANING_UP', '...')} ")
+    shutil.rmtree(job['work_dir'], ignore_errors=True)
+    summary.update(output=output_filename, status='done')
+    return summary
 
 def start_archive_cli(lang, profile):
     core_logic.perform_first_run_check(lang)
     print("--- Arşiv Dosyası Çevirme Aracı ---")
+    core_logic.configure_upload_encoder(profile)
+    core_logic.open_failures(profile)
 
     profile_exists = 'model_name' in profile
 
     api_key = ""
     api_env_path = "api.env"
     load_dotenv(dotenv_path=api_env_path)
-    saved_api_key = os.getenv("API_KEY")
+    saved_api_key = os.getenv("API_KEY") or key_pool.default_key(profile)
 
     if saved_api_key:
         print(lang.get('INFO_API_KEY_FOUND', '...'))
@@ -62,10 +192,7 @@ def start_archive_cli(lang, profile):
         
         models_path = "models.env"
         if not os.path.exists(models_path): print(f"HATA: '{models_path}' dosyası bulunamadı."); return
-        models = {}
-        with open(models_path, "r", encoding='utf-8') as f:
-            for line in f:
-                if line.strip() and not line.startswith("#"): key, value = line.strip().split('=', 1); models[key] = value
+        models = core_logic.load_models(models_path)
         selected_cost = models.get(selected_model, "0")
 
     else:
@@ -73,10 +200,7 @@ def start_archive_cli(lang, profile):
         profile['target_language'] = target_language
         models_path = "models.env"
         if not os.path.exists(models_path): print(f"HATA: '{models_path}' dosyası bulunamadı."); return
-        models = {}
-        with open(models_path, "r", encoding='utf-8') as f:
-            for line in f:
-                if line.strip() and not line.startswith("#"): key, value = line.strip().split('=', 1); models[key] = value
+        models = core_logic.load_models(models_path)
         print(f"\n--- {lang.get('HEADER_MODEL_SELECTION', '---')} ---")
         model_list = list(models.items())
         for i, (name, cost) in enumerate(model_list): print(f"[{i+1}] {name} {lang.get('INFO_CREDITS', '...').format(cost=cost)}")
@@ -115,9 +239,7 @@ def start_archive_cli(lang, profile):
     if not filepath:
         print(lang.get('INFO_ACTION_CANCELLED', '...')); return
 
-    file_ext = os.path.splitext(filepath)[1].lower()
-    
-    if file_ext == '.epub':
+    if formats.for_path(filepath).experimental:
         confirm = input(f"\n{lang.get('WARN_EPUB_EXPERIMENTAL', '...')}").lower()
         if confirm not in ['e', 'evet', 'y', 'yes']:
             print(lang.get('INFO_ACTION_CANCELLED', '...')); return
@@ -126,92 +248,55 @@ def start_archive_cli(lang, profile):
         save_profile(profile)
         print(f"\n{lang.get('INFO_PROFILE_CREATED', '...')}")
 
-    with tempfile.TemporaryDirectory() as temp_dir:
-        extract_dir = os.path.join(temp_dir, "extracted")
-        os.makedirs(extract_dir)
-        print(lang.get('INFO_EXTRACTING', '...').format(filename=os.path.basename(filepath)))
-        image_map = None
-        try:
-            if file_ext == '.pdf': core_logic.extract_pdf(filepath, extract_dir)
-            elif file_ext in ('.cbz', '.zip'): core_logic.extract_zip(filepath, extract_dir)
-            elif file_ext in ('.cbr', '.rar'): core_logic.extract_rar(filepath, extract_dir)
-            elif file_ext in ('.cb7', '.7z'): core_logic.extract_7z(filepath, extract_dir)
-            elif file_ext == '.epub': image_map = core_logic.extract_epub(filepath, extract_dir)
-            else: print(f"Desteklenmeyen dosya formatı: {file_ext}"); return
-        except Exception as e:
-            print(f"Dosya çıkarılırken hata oluştu: {e}"); return
-        
-        extracted_files = core_logic.find_all_images(extract_dir)
-        print(lang.get('INFO_EXTRACTING_SUCCESS', '...').format(count=len(extracted_files)))
-        
-        print(f"\n--- {lang.get('HEADER_PREPROCESS', '---')} ---")
-        images_to_process = []
-        for img_path in extracted_files:
-            if core_logic.preprocess_image(img_path, extract_dir, lang):
-                images_to_process.append(img_path)
-
-        image_count = len(images_to_process)
-        print(f"\n--- {lang.get('HEADER_COST_CONFIRM', '---')} ---")
-        if image_count == 0:
-            print(f"Arşiv içinde çevrilecek resim bulunamadı."); return
-            
-        print(lang.get('INFO_FOLDER_SELECTED', "...").format(folder=os.path.basename(filepath), count=image_count))
-        print(lang.get('INFO_MODEL_SELECTED', '...').format(model_name=selected_model))
-        
-        cost_per_image_str = selected_cost.replace('+', '')
-        if cost_per_image_str.isdigit():
-            cost_per_image = int(cost_per_image_str)
-            total_cost = image_count * cost_per_image
-            if '+' in selected_cost:
-                print(lang.get('INFO_BASE_COST_ESTIMATE', '...').format(count=image_count, base_cost=cost_per_image, total_cost=total_cost))
-            else:
-                print(lang.get('INFO_TOTAL_COST', '...').format(count=image_count, cost_per_image=cost_per_image, total_cost=total_cost))
-        
-        run_workflow = False
+    journal = find_resumable_archive_job(filepath, selected_model, target_language)
+    if journal is not None:
         while True:
-            confirm = input(f"\n{lang.get('PROMPT_CONFIRM_ACTION', '...')} ").lower()
-            if confirm in ['e', 'evet', 'y', 'yes']: run_workflow = True; break
-            elif confirm in ['h', 'hayır', 'n', 'no']: print(lang.get('INFO_ACTION_CANCELLED', '...')); break
-
-        if not run_workflow:
-            return
-
-        print(f"\n--- {lang.get('HEADER_TRANSLATION_START', '---')} ---")
-        translated_folder = os.path.join(extract_dir, "translated")
-        os.makedirs(translated_folder, exist_ok=True)
-        error_folder = os.path.join(extract_dir, "error")
+            resume_confirm = input(f"\n{lang.get('PROMPT_RESUME_JOB', '...').format(source=os.path.basename(filepath), done=journal.count(job_journal.CEVRILDI), total=len(journal.states))} ").lower()
+            if resume_confirm in ['e', 'evet', 'y', 'yes']: break
+            elif resume_confirm in ['h', 'hayır', 'n', 'no']: journal = None; break
+    resuming = journal is not None
 
-        for i, file_path in enumerate(images_to_process):
-            print(lang.get('INFO_PROCESSING', '...').format(i=i+1, total=len(images_to_process), filename=os.path.basename(file_path)))
-            core_logic.process_single_file(file_path, api_key, selected_model, target_language, extract_dir, translated_folder, error_folder, lang)
-            time.sleep(0.1)
-
-        base_name = os.path.splitext(os.path.basename(filepath))[0]
-        timestamp = time.strftime("%Y%m%d_%H%M%S")
-        
-        output_dir = "archive_outputs"
-        os.makedirs(output_dir, exist_ok=True)
+    job = prepare_archive_job(filepath, selected_model, target_language, lang, journal, profile.get('skip_blank_pages', True), profile.get('skip_duplicate_pages', True))
+    if job is None:
+        return
+    journal = job['journal']
+    pending_count = len(pending_archive_pages(job))
+    image_count = pending_count - len(job['plan'])
+    print(f"\n--- {lang.get('HEADER_COST_CONFIRM', '---')} ---")
+    if resuming:
+        print(lang.get('INFO_RESUME_SKIPPED', '...').format(count=journal.count(job_journal.CEVRILDI)))
+    core_logic.print_skipped_pages(job['plan'], lang)
+    if pending_count == 0 and not resuming:
+        print(f"Arşiv içinde çevrilecek resim bulunamadı.")
+        discard_archive_job(job); return
         
-        repack_success = False
-        try:
-            if file_ext == '.pdf':
-                output_filename = os.path.join(output_dir, f"{base_name}_output_{timestamp}.pdf")
-                print(lang.get('INFO_REPACKING', '...').format(output_filename=os.path.basename(output_filename)))
-                core_logic.repack_pdf(translated_folder, output_filename)
-                repack_success = True
-            elif file_ext in ('.cbz', '.zip', '.cbr', '.rar', '.cb7', '.7z'):
-                output_filename = os.path.join(output_dir, f"{base_name}_output_{timestamp}.cbz")
-                print(lang.get('INFO_REPACKING', '...').format(output_filename=os.path.basename(output_filename)))
-                core_logic.repack_cbz(translated_folder, output_filename)
-                repack_success = True
-            elif file_ext == '.epub':
-                output_filename = os.path.join(output_dir, f"{base_name}_output_{timestamp}.epub")
-                print(lang.get('INFO_REPACKING_EPUB', '...'))
-                core_logic.repack_epub(filepath, translated_folder, image_map, output_filename)
-                repack_success = True
-            
-            if repack_success: print(lang.get('INFO_REPACKING_SUCCESS', '...'))
-        except Exception as e:
-            print(f"Dosya yeniden paketlenirken bir hata oluştu: {e}")
+    print(lang.get('INFO_FOLDER_SELECTED', "...").format(folder=os.path.basename(filepath), count=image_count))
+    print(lang.get('INFO_MODEL_SELECTED', '...').format(model_name=selected_model))
+    
+    core_logic.print_cost_estimate(image_count, selected_cost, lang, core_logic.count_requests([name for name in pending_archive_pages(job) if name not in job['plan']], job['tiles']))
+    
+    run_workflow = False
+    while True:
+        confirm = input(f"\n{lang.get('PROMPT_CONFIRM_ACTION', '...')} ").lower()
+        if confirm in ['e', 'evet', 'y', 'yes']: run_workflow = True; break
+        elif confirm in ['h', 'hayır', 'n', 'no']: print(lang.get('INFO_ACTION_CANCELLED', '...')); break
 
-    print(f"\n{lang.get('INFO_CLEANING_UP', '...')} ")
+    if not run_workflow:
+        if not resuming:
+            discard_archive_job(job)
+        return
+
+    print(f"\n--- {lang.get('HEADER_TRANSLATION_START', '---')} ---")
+    max_workers = profile.get('max_workers', core_logic.ESZAMANLI_ISTEK_SAYISI)
+    print(lang.get('INFO_PARALLEL_WORKERS', '...').format(workers=max_workers))
+    core_logic.configure_api(profile, max_workers)
+    cache = core_logic.open_translation_cache(profile)
+    core_logic.open_metrics(profile)
+    core_logic.open_key_pool(profile, api_key, lang)
+    core_logic.open_output_encoder(profile, lang)
+    run_archive_job(job, api_key, selected_model, target_language, profile, lang, max_workers, cache)
+    core_logic.close_output_encoder(lang)
+    core_logic.close_key_pool(lang)
+    core_logic.print_cache_stats(cache, lang)
+    core_logic.close_metrics(lang)
+    core_logic.close_failures(lang)
@@ -0,0 +1,229 @@
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+import core_logic
+import archive_mode
+import cli_mode
+import job_journal
+import key_pool
+import failures
+import formats
+import scan_index
+
+ESZAMANLI_IS_SAYISI = 2
+
+def load_manifest(manifest_path):
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if isinstance(manifest, list):
+        manifest = {'jobs': manifest}
+    return manifest
+
+def collect_jobs(paths, lang, changed_only=False):
+    entries = []
+    index = scan_index.get_index()
+    for item in paths:
+        entry = {'path': item} if isinstance(item, str) else dict(item)
+        path = os.path.normpath(entry['path'])
+        if os.path.isdir(path):
+            for archive_path in archive_mode.find_all_archives(path, lang):
+                if not changed_only or index.is_changed(archive_path):
+                    entries.append({**entry, 'path': archive_path, 'kind': 'archive'})
+            images = core_logic.find_all_images(path, use_index=True)
+            if changed_only:
+                images = index.changed_since_translation(images)
+            if images:
+                entries.append({**entry, 'path': path, 'kind': 'folder', 'images': images})
+        elif os.path.isfile(path) and formats.for_path(path) is not None:
+            if not changed_only or index.is_changed(path):
+                entries.append({**entry, 'path': path, 'kind': 'archive'})
+        elif os.path.isfile(path) and path.lower().endswith(core_logic.GECERLI_UZANTILAR):
+            if not changed_only or index.is_changed(path):
+                entries.append({**entry, 'path': path, 'kind': 'image'})
+        else:
+            print(lang.get('WARN_BATCH_SKIPPED_PATH', '...').format(path=path))
+    return entries
+
+def collect_redrive_jobs(records, lang):
+    entries = []
+    for job_id, job_records in records.items():
+        journal = job_journal.load_job(job_id)
+        if journal is None or (journal.header['kind'] == 'archive' and not archive_mode.can_resume(journal)):
+            print(lang.get('ERROR_REDRIVE_JOB_MISSING', '...').format(job_id=job_id, source=job_records[0]['source']))
+            continue
+        header = journal.header
+        entries.append({'path': header['source'], 'kind': header['kind'], 'model': header['model'], 'target_lang': header['target_lang'], 'journal': journal, 'pages': [record['page'] for record in job_records]})
+    return entries
+
+def outstanding_failures(records):
+    retry, permanent = failures.group_by_job(records)
+    for job_id in list(retry):
+        journal = job_journal.load_job(job_id)
+        if journal is None:
+            continue
+        # A page the journal has as translated succeeded after it was recorded here; sending it again would bill it twice.
+        retry[job_id] = [record for record in retry[job_id] if journal.get_state(record['page']) != job_journal.CEVRILDI]
+        if not retry[job_id]:
+            del retry[job_id]
+    return retry, permanent
+
+def latest_redrive_manifest(paths):
+    for path in paths:
+        # A job whose journal is gone finished without failures on a later run, so only a surviving journal counts.
+        if any(job_journal.load_job(job_id) is not None for job_id in outstanding_failures(failures.load(path))[0]):
+            return path
+    return None
+
+def run_job(entry, settings, lang, cache, executor):
+    model = entry.get('model', settings['model'])
+    target_lang = entry.get('target_lang', settings['target_lang'])
+    summary = {'source': entry['path'], 'kind': entry['kind'], 'pages': 0, 'translated': 0, 'failed': 0, 'skipped': 0, 'output': None, 'status': 'error', 'seconds': 0}
+    try:
+        if 'pages' in entry:
+            print(lang.get('INFO_BATCH_JOB_READY', '...').format(source=entry['path'], count=len(entry['pages'])))
+            if entry['kind'] == 'archive':
+                job = archive_mode.prepare_archive_job(entry['path'], model, target_lang, lang, entry['journal'], False, False)
+                if job is None:
+                    return summary
+                return archive_mode.run_archive_job(job, settings['api_key'], model, target_lang, settings['profile'], lang, settings['workers'], cache, executor, settings['output_dir'], set(entry['pages']))
+            job = cli_mode.prepare_redrive_folder_job(entry['journal'], entry['pages'])
+            return cli_mode.run_folder_job(job, settings['api_key'], model, target_lang, lang, settings['workers'], cache, executor)
+        if entry['kind'] == 'image':
+            return cli_mode.run_image_job(entry['path'], settings['api_key'], model, target_lang, lang, settings['output_dir'], cache)
+        if entry['kind'] == 'archive':
+            journal = archive_mode.find_resumable_archive_job(entry['path'], model, target_lang)
+            job = archive_mode.prepare_archive_job(entry['path'], model, target_lang, lang, journal, settings['skip_blank'], settings['skip_duplicates'])
+            if job is None:
+                return summary
+            if not archive_mode.pending_archive_pages(job) and not job['resuming']:
+                archive_mode.discard_archive_job(job)
+                summary['status'] = 'empty'
+                return summary
+            print(lang.get('INFO_BATCH_JOB_READY', '...').format(source=entry['path'], count=len(archive_mode.pending_archive_pages(job)) - len(job['plan'])))
+            return archive_mode.run_archive_job(job, settings['api_key'], model, target_lang, settings['profile'], lang, settings['workers'], cache, executor, settings['output_dir'])
+        else:
+            journal = job_journal.find_incomplete('folder', entry['path'], model, target_lang)
+            job = cli_mode.prepare_folder_job(entry['path'], model, target_lang, lang, journal, entry.get('images'), settings['skip_blank'], settings['skip_duplicates'])
+            print(lang.get('INFO_BATCH_JOB_READY', '...').format(source=entry['path'], count=len(job['images']) - len(job['plan'])))
+            return cli_mode.run_folder_job(job, settings['api_key'], model, target_lang, lang, settings['workers'], cache, executor)
+    except Exception as e:
+        summary['error'] = str(e)
+        print(lang.get('ERROR_BATCH_JOB_FAILED', '...').format(source=entry['path'], error=e))
+        return summary
+
+def print_summary(summaries, lang):
+    print(f"\n--- {lang.get('HEADER_BATCH_SUMMARY', '---')} ---")
+    for summary in summaries:
+        print(lang.get('INFO_BATCH_SUMMARY_LINE', '...').format(**summary))
+    translated = sum(summary['translated'] for summary in summaries)
+    failed = sum(summary['failed'] for summary in summaries)
+    print(lang.get('INFO_BATCH_TOTALS', '...').format(jobs=len(summaries), translated=translated, failed=failed))
+
+def start_batch(args, lang, profile):
+    print(f"--- {lang.get('HEADER_BATCH', '---')} ---")
+    core_logic.configure_upload_encoder(profile)
+    core_logic.open_failures(profile)
+    manifest = load_manifest(args.manifest) if args.manifest else {}
+    model = args.model or manifest.get('model') or profile.get('model_name')
+    target_lang = args.target_lang or manifest.get('target_lang') or profile.get('target_language') or "en"
+    if not model:
+        print(lang.get('ERROR_BATCH_NO_MODEL', '...')); return 1
+
+    load_dotenv(dotenv_path="api.env")
+    api_key = args.api_key or os.getenv("API_KEY") or key_pool.default_key(profile)
+    if not api_key:
+        print(lang.get('ERROR_BATCH_NO_API_KEY', '...')); return 1
+
+    changed_only = args.changed_only or manifest.get('changed_only', False)
+    entries = collect_jobs(manifest.get('jobs', []) + list(args.paths), lang, changed_only)
+    if not entries and changed_only:
+        print(lang.get('INFO_BATCH_NOTHING_CHANGED', '...')); return 0
+    if not entries:
+        print(lang.get('ERROR_BATCH_NO_JOBS', '...')); return 1
+
+    workers = int(args.workers or manifest.get('workers') or profile.get('max_workers', core_logic.ESZAMANLI_ISTEK_SAYISI))
+    job_count = int(args.jobs or manifest.get('parallel_jobs') or ESZAMANLI_IS_SAYISI)
+    settings = {
+        'model': model,
+        'target_lang': target_lang,
+        'api_key': api_key,
+        'workers': workers,
+        'profile': profile,
+        'output_dir': args.output_dir or manifest.get('output_dir') or archive_mode.ARCHIVE_OUTPUT_DIR,
+        'skip_blank': profile.get('skip_blank_pages', True),
+        'skip_duplicates': profile.get('skip_duplicate_pages', True),
+    }
+    print(lang.get('INFO_BATCH_JOBS_FOUND', '...').format(count=len(entries), model=model, target=target_lang))
+    return run_jobs(entries, settings, lang, profile, job_count, args.report)
+
+def run_jobs(entries, settings, lang, profile, job_count, report_path=None):
+    workers = settings['workers']
+    print(lang.get('INFO_PARALLEL_WORKERS', '...').format(workers=workers))
+
+    core_logic.configure_api(profile, workers)
+    cache = core_logic.open_translation_cache(profile)
+    core_logic.open_metrics(profile)
+    core_logic.open_key_pool(profile, settings['api_key'], lang)
+    core_logic.open_output_encoder(profile, lang)
+    started = time.time()
+    summaries = [None] * len(entries)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as upload_executor, ThreadPoolExecutor(max_workers=max(1, job_count)) as job_executor:
+        futures = {job_executor.submit(run_job, entry, settings, lang, cache, upload_executor): i for i, entry in enumerate(entries)}
+        for done, future in enumerate(as_completed(futures), 1):
+            summary = summaries[futures[future]] = future.result()
+            print(lang.get('INFO_BATCH_JOB_DONE', '...').format(done=done, total=len(entries), **summary))
+
+    models = core_logic.load_models() if os.path.exists("models.env") else {}
+    for entry, summary in zip(entries, summaries):
+        summary['credits'] = core_logic.job_credits(summary, models.get(entry.get('model', settings['model']), "0"))
+    print_summary(summaries, lang)
+    core_logic.close_output_encoder(lang)
+    core_logic.close_key_pool(lang)
+    core_logic.print_cache_stats(cache, lang)
+    core_logic.close_metrics(lang)
+    core_logic.close_failures(lang)
+
+    report_path = report_path or f"batch_report_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump({'model': settings['model'], 'target_lang': settings['target_lang'], 'seconds': round(time.time() - started, 2), 'jobs': summaries}, f, indent=4, ensure_ascii=False)
+    print(lang.get('INFO_BATCH_REPORT_SAVED', '...').format(path=report_path))
+    return 0 if all(summary['status'] in ('done', 'empty') and summary['failed'] == 0 for summary in summaries) else 1
+
+def start_redrive(args, lang, profile):
+    print(f"--- {lang.get('HEADER_REDRIVE', '---')} ---")
+    core_logic.configure_upload_encoder(profile)
+    manifest_path = args.redrive
+    if args.redrive == 'latest':
+        manifests = failures.list_manifests(profile.get('failures_dir', failures.FAILURES_DIR))
+        manifest_path = latest_redrive_manifest(manifests)
+        if manifests and manifest_path is None:
+            print(lang.get('INFO_REDRIVE_NOTHING', '...')); return 0
+    if not manifest_path or not os.path.exists(manifest_path):
+        print(lang.get('ERROR_REDRIVE_NO_MANIFEST', '...')); return 1
+    retry, permanent = outstanding_failures(failures.load(manifest_path))
+    print(lang.get('INFO_REDRIVE_LOADED', '...').format(path=manifest_path, retryable=sum(len(records) for records in retry.values()), jobs=len(retry), permanent=permanent))
+    if not retry:
+        print(lang.get('INFO_REDRIVE_NOTHING', '...')); return 0
+
+    load_dotenv(dotenv_path="api.env")
+    api_key = args.api_key or os.getenv("API_KEY") or key_pool.default_key(profile)
+    if not api_key:
+        print(lang.get('ERROR_BATCH_NO_API_KEY', '...')); return 1
+
+    core_logic.open_failures(profile)
+    entries = collect_redrive_jobs(retry, lang)
+    if not entries:
+        return 1
+    settings = {
+        'model': profile.get('model_name'),
+        'target_lang': profile.get('target_language'),
+        'api_key': api_key,
+        'workers': int(args.workers or profile.get('max_workers', core_logic.ESZAMANLI_ISTEK_SAYISI)),
+        'profile': profile,
+        'output_dir': args.output_dir or archive_mode.ARCHIVE_OUTPUT_DIR,
+        'skip_blank': False,
+        'skip_duplicates': False,
+    }
+    return run_jobs(entries, settings, lang, profile, int(args.jobs or ESZAMANLI_IS_SAYISI), args.report)
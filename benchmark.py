@@ -0,0 +1,280 @@
+import os
+import io
+import sys
+import json
+import math
+import time
+import shutil
+import zipfile
+import tempfile
+import argparse
+import contextlib
+from PIL import Image
+import fitz
+import py7zr
+import api_client
+import core_logic
+import formats
+import mock_server
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))]
+
+def peak_rss_mb():
+    if resource is None:
+        return None, None
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / divisor
+
+def make_image(width, height, seed, quality=90):
+    noise = Image.effect_noise((width, height), 40 + seed % 20)
+    img = Image.merge('RGB', (noise, noise.rotate(180), Image.new('L', (width, height), (seed * 37) % 256)))
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+def make_large_image(target_mb, seed):
+    side = 1024
+    while True:
+        buffer = io.BytesIO()
+        Image.effect_noise((side, side), 120).convert('RGB').save(buffer, 'PNG', compress_level=1)
+        if buffer.tell() >= target_mb * 1024 * 1024:
+            return buffer.getvalue()
+        side = int(side * 1.4)
+
+def build_epub(path, pages):
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(zipfile.ZipInfo('mimetype'), 'application/epub+zip')
+        zf.writestr('META-INF/container.xml', '<?xml version="1.0"?><container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container"><rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles></container>')
+        manifest, spine = [], []
+        for i, data in enumerate(pages):
+            zf.writestr(f'OEBPS/images/page_{i:04d}.jpg', data)
+            zf.writestr(f'OEBPS/page_{i:04d}.xhtml', f'<?xml version="1.0" encoding="utf-8"?><html xmlns="http://www.w3.org/1999/xhtml"><body><img src="images/page_{i:04d}.jpg"/></body></html>')
+            manifest.append(f'<item id="img{i}" href="images/page_{i:04d}.jpg" media-type="image/jpeg"/><item id="p{i}" href="page_{i:04d}.xhtml" media-type="application/xhtml+xml"/>')
+            spine.append(f'<itemref idref="p{i}"/>')
+        zf.writestr('OEBPS/content.opf', f'<?xml version="1.0" encoding="utf-8"?><package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="id"><metadata xmlns:dc="http://purl.org/dc/elements/1.1/"><dc:identifier id="id">benchmark</dc:identifier><dc:title>benchmark</dc:title><dc:language>en</dc:language></metadata><manifest>{"".join(manifest)}</manifest><spine>{"".join(spine)}</spine></package>')
+
+def build_fixtures(root, page_count, width, height, large_count, large_mb):
+    pages = [make_image(width, height, i) for i in range(page_count)]
+    fixtures = {'folder': os.path.join(root, 'folder'), 'large': os.path.join(root, 'large')}
+    os.makedirs(fixtures['folder'])
+    os.makedirs(fixtures['large'])
+    for i, data in enumerate(pages):
+        with open(os.path.join(fixtures['folder'], f'page_{i:04d}.jpg'), 'wb') as f: f.write(data)
+    for i in range(large_count):
+        with open(os.path.join(fixtures['large'], f'large_{i:03d}.png'), 'wb') as f: f.write(make_large_image(large_mb, i))
+
+    fixtures['pdf'] = os.path.join(root, 'book.pdf')
+    with fitz.open() as doc:
+        for data in pages:
+            page = doc.new_page(width=width * 72 / 150, height=height * 72 / 150)
+            page.insert_image(page.rect, stream=data)
+        doc.save(fixtures['pdf'])
+
+    fixtures['cbz'] = os.path.join(root, 'book.cbz')
+    with zipfile.ZipFile(fixtures['cbz'], 'w', zipfile.ZIP_STORED) as zf:
+        for i, data in enumerate(pages):
+            zf.writestr(f'chapter_{i // 20 + 1:02d}/page_{i:04d}.jpg', data)
+
+    fixtures['cb7'] = os.path.join(root, 'book.cb7')
+    with py7zr.SevenZipFile(fixtures['cb7'], 'w') as z:
+        for i, data in enumerate(pages):
+            z.writestr(data, f'page_{i:04d}.jpg')
+
+    fixtures['epub'] = os.path.join(root, 'book.epub')
+    build_epub(fixtures['epub'], pages)
+    return fixtures
+
+class Benchmark:
+    def __init__(self, root, repeat):
+        self.root = root
+        self.repeat = max(1, int(repeat))
+        self.results = []
+
+    def fresh_dir(self, name):
+        return tempfile.mkdtemp(prefix=f"{name}_", dir=self.root)
+
+    def record(self, stage, items, durations, wall_seconds=None):
+        wall_seconds = wall_seconds if wall_seconds is not None else sum(durations)
+        own_rss, children_rss = peak_rss_mb()
+        result = {
+            'stage': stage,
+            'items': items,
+            'seconds': wall_seconds,
+            'items_per_sec': items / wall_seconds if wall_seconds > 0 else 0.0,
+            'p50_ms': percentile(durations, 50) * 1000,
+            'p90_ms': percentile(durations, 90) * 1000,
+            'p99_ms': percentile(durations, 99) * 1000,
+            'max_ms': max(durations) * 1000 if durations else 0.0,
+            'peak_rss_mb': own_rss,
+            'peak_rss_children_mb': children_rss,
+        }
+        self.results.append(result)
+        print(f"  {stage:<22} {items:>5} items  {result['items_per_sec']:>8.2f}/s  p50 {result['p50_ms']:>8.1f} ms  p99 {result['p99_ms']:>8.1f} ms")
+        return result
+
+    def timed_runs(self, stage, items, run):
+        durations = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                run()
+            durations.append(time.perf_counter() - started)
+        return self.record(stage, items * self.repeat, durations)
+
+def bench_extract(bench, fixtures, page_count, rar_path=None):
+    extractors = [
+        ('extract_pdf', formats.extract_pdf, fixtures['pdf']),
+        ('extract_zip', formats.extract_zip, fixtures['cbz']),
+        ('extract_7z', formats.extract_7z, fixtures['cb7']),
+        ('extract_epub', formats.extract_epub, fixtures['epub']),
+    ]
+    if rar_path:
+        extractors.append(('extract_rar', formats.extract_rar, rar_path))
+    for stage, extract, path in extractors:
+        count = page_count if path != rar_path else len(core_logic.list_archive_images(path, '.rar', None))
+        bench.timed_runs(stage, count, lambda: extract(path, bench.fresh_dir(stage)))
+
+def bench_preprocess(bench, fixtures):
+    originals = core_logic.find_all_images(fixtures['large'])
+    if not originals:
+        return
+    durations = []
+    for _ in range(bench.repeat):
+        work_dir = bench.fresh_dir('preprocess')
+        for path in originals:
+            copy_path = shutil.copy(path, work_dir)
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                core_logic.preprocess_image(copy_path, work_dir, {})
+            durations.append(time.perf_counter() - started)
+    bench.record('preprocess_image', len(durations), durations)
+
+    work_dir = bench.fresh_dir('preprocess_batch')
+    copies = [shutil.copy(path, work_dir) for path in originals]
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        core_logic.preprocess_images(copies, work_dir, {})
+    elapsed = time.perf_counter() - started
+    bench.record('preprocess_images', len(copies), [elapsed / len(copies)] * len(copies), elapsed)
+
+def bench_translate(bench, fixtures, workers):
+    source = fixtures['folder']
+    images = core_logic.find_all_images(source)
+    durations = []
+    for _ in range(bench.repeat):
+        output = bench.fresh_dir('translated')
+        for path in images:
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                core_logic.process_single_file(path, "benchmark", "benchmark", "en", source, output, os.path.join(output, "error"), {})
+            durations.append(time.perf_counter() - started)
+    bench.record('process_single_file', len(durations), durations)
+
+    output = bench.fresh_dir('translated_parallel')
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        core_logic.translate_images(images, "benchmark", "benchmark", "en", source, output, os.path.join(output, "error"), {}, workers)
+    elapsed = time.perf_counter() - started
+    bench.record(f'translate_images x{workers}', len(images), [elapsed / max(1, len(images))] * len(images), elapsed)
+    return output
+
+def bench_repack(bench, fixtures, translated_folder, page_count):
+    bench.timed_runs('repack_pdf', page_count, lambda: formats.repack_pdf(translated_folder, os.path.join(bench.fresh_dir('repack_pdf'), 'out.pdf'), fixtures['pdf']))
+    bench.timed_runs('repack_cbz', page_count, lambda: formats.repack_cbz(translated_folder, os.path.join(bench.fresh_dir('repack_cbz'), 'out.cbz')))
+
+    epub_work = bench.fresh_dir('epub_source')
+    image_map = formats.extract_epub(fixtures['epub'], epub_work)
+    epub_translated = bench.fresh_dir('epub_translated')
+    for extracted_path, internal_name in image_map.items():
+        target = core_logic.translated_output_path(internal_name, epub_translated)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copy(extracted_path, target)
+    bench.timed_runs('repack_epub', page_count, lambda: formats.repack_epub(fixtures['epub'], epub_translated, image_map, os.path.join(bench.fresh_dir('repack_epub'), 'out.epub')))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark against the local mock translation server")
+    parser.add_argument('--pages', type=int, default=40, help="Pages per synthetic folder/PDF/CBZ/CB7/EPUB")
+    parser.add_argument('--width', type=int, default=1200)
+    parser.add_argument('--height', type=int, default=1800)
+    parser.add_argument('--large-images', type=int, default=4, help="Oversized images fed to preprocess_image")
+    parser.add_argument('--large-mb', type=float, default=2.0, help="Size of each oversized image")
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=core_logic.ESZAMANLI_ISTEK_SAYISI)
+    parser.add_argument('--rps', type=float, default=100.0, help="Client-side request rate limit during the run")
+    parser.add_argument('--api-url', help="Use an already running server instead of the bundled mock")
+    parser.add_argument('--latency-ms', type=float, default=200.0)
+    parser.add_argument('--jitter-ms', type=float, default=50.0)
+    parser.add_argument('--distribution', choices=('fixed', 'uniform', 'lognormal'), default='lognormal')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--burst-every', type=int, default=0)
+    parser.add_argument('--burst-length', type=int, default=0)
+    parser.add_argument('--bandwidth-kbps', type=float, default=0.0)
+    parser.add_argument('--rar', help="Existing .cbr/.rar to time extract_rar with (RAR archives cannot be generated)")
+    parser.add_argument('--stages', default="extract,preprocess,translate,repack", help="Comma separated subset of stages")
+    parser.add_argument('--work-dir', help="Keep fixtures and outputs here instead of a temporary folder")
+    parser.add_argument('--json', help="Write the results to this JSON file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    stages = {stage.strip() for stage in args.stages.split(',') if stage.strip()}
+    root = args.work_dir or tempfile.mkdtemp(prefix="translator_benchmark_")
+    os.makedirs(root, exist_ok=True)
+    server = None
+    if args.api_url:
+        core_logic.API_URL = args.api_url
+    else:
+        server = mock_server.start(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, distribution=args.distribution, error_rate=args.error_rate, burst_every=args.burst_every, burst_length=args.burst_length, bandwidth_kbps=args.bandwidth_kbps, seed=1)
+        core_logic.API_URL = server.url
+    api_client.configure(rate=args.rps, pool_size=max(10, args.workers))
+    # The bundled fixtures stay small; scale the compression threshold so preprocess_image still has work to do.
+    core_logic.MAX_DOSYA_BOYUTU_MB = args.large_mb * 0.5
+    core_logic.HEDEF_BOYUT_MB = args.large_mb * 0.45
+
+    print(f"Building fixtures in {root} ({args.pages} pages, {args.width}x{args.height})...")
+    started = time.perf_counter()
+    fixtures = build_fixtures(root, args.pages, args.width, args.height, args.large_images if 'preprocess' in stages else 0, args.large_mb)
+    print(f"Fixtures ready in {time.perf_counter() - started:.1f}s. API: {core_logic.API_URL}")
+
+    list(core_logic.get_process_pool().map(abs, range(os.cpu_count() or 1)))
+    bench = Benchmark(root, args.repeat)
+    try:
+        if 'extract' in stages:
+            bench_extract(bench, fixtures, args.pages, args.rar)
+        if 'preprocess' in stages:
+            bench_preprocess(bench, fixtures)
+        translated_folder = fixtures['folder']
+        if 'translate' in stages:
+            translated_folder = bench_translate(bench, fixtures, args.workers)
+        if 'repack' in stages:
+            bench_repack(bench, fixtures, translated_folder, args.pages)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        if not args.work_dir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    own_rss, children_rss = peak_rss_mb()
+    if own_rss is not None:
+        print(f"Peak RSS: {own_rss:.1f} MB (worker processes: {children_rss:.1f} MB)")
+    if server is not None:
+        print(f"Mock server: {json.dumps(server.config.stats)}")
+    if args.json:
+        report = {'settings': vars(args), 'results': bench.results, 'peak_rss_mb': own_rss, 'peak_rss_children_mb': children_rss, 'server': server.config.stats if server else None}
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
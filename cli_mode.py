@@ -5,16 +5,113 @@ import time
 import json
 from dotenv import load_dotenv
 import core_logic
+import job_journal
+import key_pool
+import failures
+import metrics
+import scan_index
+import output_encoder
+
+def prepare_folder_job(folder, model, target_lang, lang, journal=None, image_paths=None, skip_blank=True, skip_duplicates=True):
+    resuming = journal is not None
+    if resuming:
+        journal.repair()
+        output_folder = journal.header['output_folder']
+        print(lang.get('INFO_RESUMING_JOB', '...').format(work_dir=output_folder))
+    else:
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        output_folder = f"{folder}_output_{timestamp}"
+        journal = job_journal.JobJournal.create('folder', folder, model, target_lang, output_folder)
+    failures.register_job(os.path.join(folder, "error"), journal)
+
+    all_image_paths = image_paths if image_paths is not None else core_logic.find_all_images(folder, use_index=True)
+    journal.add_images([os.path.relpath(path, folder) for path in all_image_paths])
+    
+    print(f"\n--- {lang.get('HEADER_PREPROCESS', '---')} ---")
+    images_to_process = []
+    pending_paths = [path for path in all_image_paths if journal.get_state(os.path.relpath(path, folder)) != job_journal.CEVRILDI]
+    # With keep_originals the upload encoder shrinks pages in memory, so source files are never rewritten.
+    to_preprocess = [] if core_logic.keep_originals() else [path for path in pending_paths if journal.get_state(os.path.relpath(path, folder)) != job_journal.ONISLENDI]
+    preprocess_results = dict(zip(to_preprocess, core_logic.preprocess_images(to_preprocess, folder, lang)))
+    for img_path in pending_paths:
+        relative_path = os.path.relpath(img_path, folder)
+        if img_path not in preprocess_results:
+            images_to_process.append(img_path)
+        elif preprocess_results[img_path]:
+            journal.set_state(relative_path, job_journal.ONISLENDI)
+            images_to_process.append(img_path)
+        else:
+            journal.set_state(relative_path, job_journal.BASARISIZ)
+    plan = core_logic.plan_image_files(images_to_process, skip_blank, skip_duplicates)
+    tiles = core_logic.plan_image_requests([path for path in images_to_process if path not in plan])
+    return {'folder': folder, 'output_folder': output_folder, 'journal': journal, 'images': images_to_process, 'plan': plan, 'tiles': tiles, 'resuming': resuming}
+
+def prepare_redrive_folder_job(journal, pages):
+    folder = journal.header['source']
+    journal.repair()
+    failures.register_job(os.path.join(folder, "error"), journal)
+    # Pages the journal already has as translated were billed once; the manifest may still list an earlier failure for them.
+    images = [os.path.join(folder, page) for page in pages if journal.get_state(page) != job_journal.CEVRILDI and os.path.exists(os.path.join(folder, page))]
+    return {'folder': folder, 'output_folder': journal.header['output_folder'], 'journal': journal, 'images': images, 'plan': {}, 'tiles': core_logic.plan_image_requests(images), 'resuming': True}
+
+def run_folder_job(job, api_key, model, target_lang, lang, max_workers, cache=None, executor=None):
+    started = time.time()
+    folder, journal = job['folder'], job['journal']
+    error_folder = os.path.join(folder, "error")
+    os.makedirs(job['output_folder'], exist_ok=True)
+    core_logic.translate_images(job['images'], api_key, model, target_lang, folder, job['output_folder'], error_folder, lang, max_workers, cache, journal, executor, job['plan'])
+    journal.complete()
+    translated = [os.path.join(folder, path) for path, state in journal.states.items() if state == job_journal.CEVRILDI]
+    scan_index.get_index().mark_translated(translated)
+    return {
+        'source': folder,
+        'kind': 'folder',
+        'pages': len(journal.states),
+        'translated': journal.count(job_journal.CEVRILDI),
+        'failed': journal.count(job_journal.BASARISIZ),
+        'skipped': len(job['plan']),
+        'requests': core_logic.count_requests([path for path in translated if path not in job['plan']], job['tiles']),
+        'output': job['output_folder'],
+        'status': 'done',
+        'seconds': round(time.time() - started, 2),
+    }
+
+def run_image_job(path, api_key, model, target_lang, lang, output_folder, cache=None, source_folder=None):
+    started = time.time()
+    source_folder = source_folder or os.path.dirname(path) or '.'
+    os.makedirs(output_folder, exist_ok=True)
+    metrics.get_metrics().expect(1)
+    success, message = core_logic.translate_file(path, api_key, model, target_lang, source_folder, output_folder, os.path.join(output_folder, "error"), lang, cache)
+    print(lang.get('INFO_PROCESSING', '...').format(i=1, total=1, filename=path))
+    print(message)
+    if cache is not None:
+        cache.flush()
+    if success:
+        scan_index.get_index().mark_translated([path])
+    return {
+        'source': path,
+        'kind': 'image',
+        'pages': 1,
+        'translated': 1 if success else 0,
+        'failed': 0 if success else 1,
+        'skipped': 0,
+        'requests': core_logic.count_requests([path], core_logic.plan_image_requests([path])) if success else 0,
+        'output': output_encoder.resolve(core_logic.translated_output_path(os.path.relpath(path, source_folder), output_folder)) if success else None,
+        'status': 'done',
+        'seconds': round(time.time() - started, 2),
+    }
 
 def start_cli(lang, profile):
     print("--- Klasör Çevirme Aracı ---")
+    core_logic.configure_upload_encoder(profile)
+    core_logic.open_failures(profile)
     
     profile_exists = 'model_name' in profile
 
     api_key = ""
     api_env_path = "api.env"
     load_dotenv(dotenv_path=api_env_path)
-    saved_api_key = os.getenv("API_KEY")
+    saved_api_key = os.getenv("API_KEY") or key_pool.default_key(profile)
 
     if saved_api_key:
         print(lang.get('INFO_API_KEY_FOUND', '...'))
@@ -41,20 +138,14 @@ def start_cli(lang, profile):
         print(lang.get('INFO_PROFILE_TARGET', '...').format(target=target_language))
         print(lang.get('INFO_PROFILE_MODEL', '...').format(model=selected_model))
         models_path = "models.env"
-        models = {}
-        with open(models_path, "r", encoding='utf-8') as f:
-            for line in f:
-                if line.strip() and not line.startswith("#"): key, value = line.strip().split('=', 1); models[key] = value
+        models = core_logic.load_models(models_path)
         selected_cost = models.get(selected_model, "0")
     else:
         target_language = input(f"\n{lang.get('PROMPT_TARGET_LANGUAGE', '...')} ").lower().strip() or "en"
         profile['target_language'] = target_language
         models_path = "models.env"
         if not os.path.exists(models_path): print(f"HATA: '{models_path}' dosyası bulunamadı."); return
-        models = {}
-        with open(models_path, "r", encoding='utf-8') as f:
-            for line in f:
-                if line.strip() and not line.startswith("#"): key, value = line.strip().split('=', 1); models[key] = value
+        models = core_logic.load_models(models_path)
         print(f"\n--- {lang.get('HEADER_MODEL_SELECTION', '---')} ---")
         model_list = list(models.items())
         for i, (name, cost) in enumerate(model_list): print(f"[{i+1}] {name} {lang.get('INFO_CREDITS', '...').format(cost=cost)}")
@@ -80,31 +171,34 @@ def start_cli(lang, profile):
             else: print(lang.get('ERROR_INVALID_CHOICE', '...'))
         except ValueError: print(lang.get('ERROR_VALUE_ERROR', '...'))
 
-    all_image_paths = core_logic.find_all_images(selected_folder)
-    
-    print(f"\n--- {lang.get('HEADER_PREPROCESS', '---')} ---")
-    images_to_process = []
-    for img_path in all_image_paths:
-        if core_logic.preprocess_image(img_path, selected_folder, lang):
-            images_to_process.append(img_path)
+    journal = job_journal.find_incomplete('folder', selected_folder, selected_model, target_language)
+    if journal is not None:
+        while True:
+            resume_confirm = input(f"\n{lang.get('PROMPT_RESUME_JOB', '...').format(source=selected_folder, done=journal.count(job_journal.CEVRILDI), total=len(journal.states))} ").lower()
+            if resume_confirm in ['e', 'evet', 'y', 'yes']: break
+            elif resume_confirm in ['h', 'hayır', 'n', 'no']: journal = None; break
+    resuming = journal is not None
+
+    job = prepare_folder_job(selected_folder, selected_model, target_language, lang, journal, None, profile.get('skip_blank_pages', True), profile.get('skip_duplicate_pages', True))
+    journal = job['journal']
+    images_to_process = job['images']
     
-    image_count = len(images_to_process)
+    image_count = len(images_to_process) - len(job['plan'])
     
     print(f"\n--- {lang.get('HEADER_COST_CONFIRM', '---')} ---")
-    if image_count == 0:
-        print(f"'{selected_folder}' klasöründe ve alt klasörlerinde çevrilecek resim dosyası bulunamadı."); return
+    if resuming:
+        print(lang.get('INFO_RESUME_SKIPPED', '...').format(count=journal.count(job_journal.CEVRILDI)))
+    core_logic.print_skipped_pages(job['plan'], lang)
+    if not images_to_process:
+        print(f"'{selected_folder}' klasöründe ve alt klasörlerinde çevrilecek resim dosyası bulunamadı.")
+        if resuming: journal.complete()
+        else: journal.discard()
+        return
     
     print(lang.get('INFO_FOLDER_SELECTED', "...").format(folder=selected_folder, count=image_count))
     print(lang.get('INFO_MODEL_SELECTED', '...').format(model_name=selected_model))
     
-    cost_per_image_str = selected_cost.replace('+', '')
-    if cost_per_image_str.isdigit():
-        cost_per_image = int(cost_per_image_str)
-        total_cost = image_count * cost_per_image
-        if '+' in selected_cost:
-            print(lang.get('INFO_BASE_COST_ESTIMATE', '...').format(count=image_count, base_cost=cost_per_image, total_cost=total_cost))
-        else:
-            print(lang.get('INFO_TOTAL_COST', '...').format(count=image_count, cost_per_image=cost_per_image, total_cost=total_cost))
+    core_logic.print_cost_estimate(image_count, selected_cost, lang, core_logic.count_requests([path for path in images_to_process if path not in job['plan']], job['tiles']))
     
     run_workflow = False
     while True:
@@ -112,21 +206,27 @@ def start_cli(lang, profile):
         if confirm in ['e', 'evet', 'y', 'yes']: run_workflow = True; break
         elif confirm in ['h', 'hayır', 'n', 'no']: print(lang.get('INFO_ACTION_CANCELLED', '...')); break
     
+    if not run_workflow and not resuming:
+        journal.discard()
+
     if run_workflow:
         if not profile_exists:
             with open('profile.json', 'w', encoding='utf-8') as f: json.dump(profile, f, indent=4)
             print(f"\n{lang.get('INFO_PROFILE_CREATED', '...')}")
 
         print(f"\n--- {lang.get('HEADER_TRANSLATION_START', '---')} ---")
-        timestamp = time.strftime("%Y%m%d_%H%M%S")
-        output_folder = f"{selected_folder}_output_{timestamp}"
-        error_folder = os.path.join(selected_folder, "error")
-        os.makedirs(output_folder, exist_ok=True)
-        
-        for i, file_path in enumerate(images_to_process):
-            relative_path = os.path.relpath(file_path, selected_folder)
-            print(lang.get('INFO_PROCESSING', '...').format(i=i+1, total=image_count, filename=relative_path))
-            core_logic.process_single_file(file_path, api_key, selected_model, target_language, selected_folder, output_folder, error_folder, lang)
-            time.sleep(0.1)
+        max_workers = profile.get('max_workers', core_logic.ESZAMANLI_ISTEK_SAYISI)
+        print(lang.get('INFO_PARALLEL_WORKERS', '...').format(workers=max_workers))
+        core_logic.configure_api(profile, max_workers)
+        cache = core_logic.open_translation_cache(profile)
+        core_logic.open_metrics(profile)
+        core_logic.open_key_pool(profile, api_key, lang)
+        core_logic.open_output_encoder(profile, lang)
+        run_folder_job(job, api_key, selected_model, target_language, lang, max_workers, cache)
+        core_logic.close_output_encoder(lang)
+        core_logic.close_key_pool(lang)
+        core_logic.print_cache_stats(cache, lang)
+        core_logic.close_metrics(lang)
+        core_logic.close_failures(lang)
         
         print(f"\n--- {lang.get('HEADER_TRANSLATION_DONE', '---')} ---")
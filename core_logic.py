@@ -1,22 +1,46 @@
 import os
-import sys
 import time
+import io
+import re
+import mimetypes
+import math
 import shutil
-import requests
-import configparser
+import api_client
+import metrics
+import failures
+import key_pool
+import job_journal
+import scan_index
+import page_filter
+import output_encoder
+import stream_pipeline
+import formats
+import threading
+import multiprocessing
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from PIL import Image
-from dotenv import load_dotenv
-import fitz
-import zipfile
-import rarfile
-import py7zr
-from ebooklib import epub
 
 GECERLI_UZANTILAR = ('.png', '.jpg', '.jpeg', '.webp')
 MAX_DOSYA_BOYUTU_MB = 15.0
 HEDEF_BOYUT_MB = 14.8
-API_URL = "https://api.toriitranslate.com/api/upload"
+API_URL = os.getenv("TORII_API_URL", "https://api.toriitranslate.com/api/upload")
+ESZAMANLI_ISTEK_SAYISI = 4
+VARSAYILAN_FONT = "wildwords"
+UPLOAD_MAX_GENISLIK = 2400
+UPLOAD_MAX_YUKSEKLIK = 16000
+UPLOAD_HEDEF_KB = 2048
+UPLOAD_JPEG_KALITESI = 90
+UPLOAD_FORMATLARI = ('JPEG', 'PNG', 'WEBP')
+PARCA_ESIK_ORANI = 4.0
+PARCA_MIN_ORANI = 1.0
+PARCA_MAX_ORANI = 3.0
+PARCA_ESZAMANLI = 8
+BOSLUK_TOLERANSI = 8
+BOSLUK_ORNEK_GENISLIGI = 128
+
+_log_lock = threading.Lock()
+_log_files = {}
 
 def perform_first_run_check(lang):
     if os.path.exists(".setup_complete"):
@@ -43,14 +67,30 @@ def perform_first_run_check(lang):
     with open(".setup_complete", "w") as f:
         f.write("done")
 
-def log_error(error_folder, filename, message):
-    os.makedirs(error_folder, exist_ok=True)
-    log_file_path = os.path.join(error_folder, "log.txt")
+def log_error(error_folder, filename, message, status_code=None, error_class=None, attempts=None, original=None):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(log_file_path, 'a', encoding='utf-8') as f:
+    with _log_lock:
+        f = _log_files.get(error_folder)
+        if f is None:
+            os.makedirs(error_folder, exist_ok=True)
+            f = _log_files[error_folder] = open(os.path.join(error_folder, "log.txt"), 'a', encoding='utf-8', buffering=1)
         f.write(f"[{timestamp}] - {filename} - {message}\n")
+    failures.record(error_folder, filename, message, status_code, error_class, attempts, original)
+
+def close_error_logs():
+    with _log_lock:
+        for f in _log_files.values():
+            f.close()
+        _log_files.clear()
 
-def find_all_images(folder):
+def _skip_image_dir(name):
+    return name == 'error' or name.endswith('_output')
+
+def find_all_images(folder, use_index=False):
+    if use_index:
+        if any(_skip_image_dir(part) for part in os.path.normpath(folder).split(os.sep)):
+            return []
+        return sorted_alphanumeric(scan_index.get_index().walk(folder, GECERLI_UZANTILAR, _skip_image_dir))
     image_paths = []
     for root, _, files in os.walk(folder):
         path_parts = root.split(os.sep)
@@ -59,164 +99,697 @@ def find_all_images(folder):
         for file in files:
             if file.lower().endswith(GECERLI_UZANTILAR):
                 image_paths.append(os.path.join(root, file))
-    return image_paths
+    return sorted_alphanumeric(image_paths)
 
-def copy_to_error_folder(file_path, source_folder, error_folder):
-    if not os.path.exists(file_path):
-        return
-    
-    relative_path = os.path.relpath(file_path, source_folder)
-    error_target_path = os.path.join(error_folder, relative_path)
-    error_target_dir = os.path.dirname(error_target_path)
-    
-    os.makedirs(error_target_dir, exist_ok=True)
-    shutil.copy2(file_path, error_target_path)
+def _encode_jpeg(img, quality, optimize=False):
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=quality, optimize=optimize)
+    return buffer.getvalue()
 
-def preprocess_image(file_path, source_folder, lang):
+def compress_image(img, target_size_bytes, source_size=None):
+    if img.format == 'JPEG' and source_size:
+        scale = math.sqrt(target_size_bytes / source_size) * 2
+        if scale < 1:
+            img.draft('RGB', (int(img.width * scale), int(img.height * scale)))
+    if img.mode not in ('RGB', 'L'): img = img.convert('RGB')
+
+    data = _encode_jpeg(img, 95)
+    if len(data) <= target_size_bytes:
+        return data
+
+    low_data = _encode_jpeg(img, 75)
+    if len(low_data) <= target_size_bytes:
+        low, high = 75, 95
+        low_size, high_size = len(low_data), len(data)
+        best = low_data
+        while high - low > 1:
+            guess = low + int((high - low) * (target_size_bytes - low_size) / max(1, high_size - low_size))
+            quality = min(max(guess, low + 1), high - 1)
+            candidate = _encode_jpeg(img, quality)
+            if len(candidate) <= target_size_bytes:
+                low, low_size, best = quality, len(candidate), candidate
+            else:
+                high, high_size = quality, len(candidate)
+        return _encode_jpeg(img, low, optimize=True) if low > 75 else best
+
+    width, height = img.size
+    scale = 1.0
+    data = low_data
+    while len(data) > target_size_bytes:
+        scale *= math.sqrt(target_size_bytes / len(data)) * 0.97
+        new_width, new_height = int(width * scale), int(height * scale)
+        if new_width < 100 or new_height < 100: raise Exception("Image too small to compress.")
+        data = _encode_jpeg(img.resize((new_width, new_height), Image.Resampling.LANCZOS), 75)
+    return data
+
+def _compress_file_worker(file_path, target_size_bytes):
+    source_size = os.path.getsize(file_path)
+    with Image.open(file_path) as img:
+        data = compress_image(img, target_size_bytes, source_size)
+    temp_path = file_path + ".tmp.jpg"
+    with open(temp_path, 'wb') as f: f.write(data)
+    os.replace(temp_path, file_path)
+    return len(data)
+
+def _compress_data_worker(image_data, target_size_bytes):
+    with Image.open(io.BytesIO(image_data)) as img:
+        return compress_image(img, target_size_bytes, len(image_data))
+
+def _flatten_for_jpeg(img):
+    if img.mode in ('RGB', 'L'):
+        return img
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        rgba = img.convert('RGBA')
+        background = Image.new('RGB', img.size, 'white')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return img.convert('RGB')
+
+def _encode_upload_worker(image_data, max_width, max_height, target_bytes, quality):
+    with Image.open(io.BytesIO(image_data)) as img:
+        if img.format == 'JPEG':
+            img.draft('RGB', (min(img.width, max_width), min(img.height, max_height)))
+        img = _flatten_for_jpeg(img)
+        if img.width > max_width or img.height > max_height:
+            img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
+        data = _encode_jpeg(img, quality)
+        if len(data) > target_bytes:
+            data = compress_image(img, target_bytes)
+        return data
+
+_upload_settings = {'enabled': True, 'keep_originals': True, 'tiling': True, 'max_width': UPLOAD_MAX_GENISLIK, 'max_height': UPLOAD_MAX_YUKSEKLIK, 'target_kb': UPLOAD_HEDEF_KB, 'quality': UPLOAD_JPEG_KALITESI}
+
+def configure_upload_encoder(profile):
+    _upload_settings.update(
+        enabled=profile.get('upload_encoding', True),
+        keep_originals=profile.get('keep_originals', True),
+        tiling=profile.get('webtoon_tiling', True),
+        max_width=int(profile.get('upload_max_width', UPLOAD_MAX_GENISLIK)),
+        max_height=int(profile.get('upload_max_height', UPLOAD_MAX_YUKSEKLIK)),
+        target_kb=float(profile.get('upload_target_kb', UPLOAD_HEDEF_KB)),
+        quality=int(profile.get('upload_jpeg_quality', UPLOAD_JPEG_KALITESI)),
+    )
+
+def keep_originals():
+    return _upload_settings['enabled'] and _upload_settings['keep_originals']
+
+def encode_for_upload(image_data, filename):
+    guessed_type = mimetypes.guess_type(filename)[0] or 'image/jpeg'
+    settings = _upload_settings
+    if not settings['enabled']:
+        return image_data, guessed_type, filename
+    target_bytes = min(settings['target_kb'] * 1024, MAX_DOSYA_BOYUTU_MB * 1024 * 1024)
+    try:
+        with Image.open(io.BytesIO(image_data)) as img:
+            image_format, (width, height) = img.format, img.size
+        within_limits = width <= settings['max_width'] and height <= settings['max_height']
+        if image_format in UPLOAD_FORMATLARI and within_limits and len(image_data) <= target_bytes:
+            return image_data, Image.MIME.get(image_format, guessed_type), filename
+        data = get_process_pool().submit(_encode_upload_worker, image_data, settings['max_width'], settings['max_height'], target_bytes, settings['quality']).result()
+    except Exception:
+        return image_data, guessed_type, filename
+    if len(data) >= len(image_data) and image_format in UPLOAD_FORMATLARI and within_limits:
+        return image_data, Image.MIME.get(image_format, guessed_type), filename
+    return data, 'image/jpeg', f"{os.path.splitext(filename)[0]}.jpg"
+
+def image_size(image_data):
+    try:
+        with Image.open(io.BytesIO(image_data)) as img:
+            return img.size
+    except Exception:
+        return None
+
+def tall_image_size(image_data):
+    if not _upload_settings['tiling']:
+        return None
+    size = image_size(image_data)
+    return size if size is not None and size[0] > 0 and size[1] > PARCA_ESIK_ORANI * size[0] else None
+
+def expected_requests(size):
+    # A tall page goes out as tiles of at most PARCA_MAX_ORANI widths, and every tile is billed as a request of its own.
+    if not _upload_settings['tiling'] or size is None:
+        return 1
+    width, height = size
+    if width <= 0 or height <= PARCA_ESIK_ORANI * width:
+        return 1
+    return math.ceil(height / (PARCA_MAX_ORANI * width))
+
+def plan_image_requests(image_paths):
+    tiles = {}
+    if not _upload_settings['tiling']:
+        return tiles
+    for path in image_paths:
+        try:
+            with open(path, 'rb') as f:
+                count = expected_requests(image_size(f.read(64 * 1024)))
+        except OSError:
+            continue
+        if count > 1:
+            tiles[path] = count
+    return tiles
+
+def plan_archive_requests(filepath, file_ext, extract_dir, names):
+    tiles = {}
+    if not _upload_settings['tiling'] or not names:
+        return tiles
+    try:
+        for name, size in formats.for_extension(file_ext).page_sizes(filepath, extract_dir, names):
+            count = expected_requests(size)
+            if count > 1:
+                tiles[name] = count
+    except Exception:
+        pass
+    return tiles
+
+def count_requests(names, tiles):
+    return sum(tiles.get(name, 1) for name in names)
+
+def find_tile_cuts(gutter_rows, height, min_tile, max_tile):
+    cuts = [0]
+    start = 0
+    while height - start > max_tile:
+        best_run, run_start = None, None
+        for y in range(start + min_tile, start + max_tile + 1):
+            if gutter_rows[y]:
+                if run_start is None: run_start = y
+                continue
+            if run_start is not None and (best_run is None or y - run_start > best_run[1] - best_run[0]):
+                best_run = (run_start, y)
+            run_start = None
+        if run_start is not None and (best_run is None or start + max_tile + 1 - run_start > best_run[1] - best_run[0]):
+            best_run = (run_start, start + max_tile + 1)
+        start = (best_run[0] + best_run[1]) // 2 if best_run else start + max_tile
+        cuts.append(start)
+    cuts.append(height)
+    return cuts
+
+def _split_tall_image_worker(image_data, min_ratio, max_ratio):
+    with Image.open(io.BytesIO(image_data)) as img:
+        img = _flatten_for_jpeg(img)
+        width, height = img.size
+        probe = img.convert('L').resize((min(BOSLUK_ORNEK_GENISLIGI, width), height), Image.Resampling.BOX)
+        rows = probe.tobytes()
+        gutter_rows = []
+        for offset in range(0, len(rows), probe.width):
+            row = rows[offset:offset + probe.width]
+            gutter_rows.append(max(row) - min(row) <= BOSLUK_TOLERANSI)
+        cuts = find_tile_cuts(gutter_rows, height, max(1, int(width * min_ratio)), max(2, int(width * max_ratio)))
+        return width, [(_encode_jpeg(img.crop((0, top, width, bottom)), 95), bottom - top) for top, bottom in zip(cuts, cuts[1:])]
+
+def _stitch_tiles_worker(tile_contents, tile_heights, width):
+    canvas = Image.new('RGB', (width, sum(tile_heights)), 'white')
+    top = 0
+    for content, tile_height in zip(tile_contents, tile_heights):
+        with Image.open(io.BytesIO(content)) as tile:
+            tile = _flatten_for_jpeg(tile).convert('RGB')
+            if tile.size != (width, tile_height):
+                tile = tile.resize((width, tile_height), Image.Resampling.LANCZOS)
+            canvas.paste(tile, (0, top))
+        top += tile_height
+    return _encode_jpeg(canvas, 95)
+
+_tile_executor = None
+_tile_executor_lock = threading.Lock()
+
+def get_tile_executor():
+    global _tile_executor
+    with _tile_executor_lock:
+        if _tile_executor is None:
+            _tile_executor = ThreadPoolExecutor(max_workers=PARCA_ESZAMANLI)
+        return _tile_executor
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+def get_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context('spawn'))
+        return _process_pool
+
+def needs_preprocess(file_path):
     if not os.path.exists(file_path) or os.path.getsize(file_path) <= MAX_DOSYA_BOYUTU_MB * 1024 * 1024:
-        return True
-        
-    filename = os.path.basename(file_path)
-    error_folder = os.path.join(source_folder, "error")
+        return False
+    with open(file_path, 'rb') as f:
+        return tall_image_size(f.read(64 * 1024)) is None
+
+def preprocess_image(file_path, source_folder, lang):
+    return preprocess_images([file_path], source_folder, lang)[0]
+
+def preprocess_images(file_paths, source_folder, lang):
+    results = [True] * len(file_paths)
     target_size_bytes = HEDEF_BOYUT_MB * 1024 * 1024
-    print(lang.get('INFO_COMPRESSING_IMAGE', '...').format(filename=filename, size_mb=os.path.getsize(file_path) / (1024*1024)), end='', flush=True)
-    
+    error_folder = os.path.join(source_folder, "error")
+    jobs = [(i, path, os.path.getsize(path)) for i, path in enumerate(file_paths) if needs_preprocess(path)]
+    if not jobs:
+        return results
+
+    pool = get_process_pool() if len(jobs) > 1 else None
+    futures = [pool.submit(_compress_file_worker, path, target_size_bytes) if pool else None for _, path, _ in jobs]
+    for (i, file_path, size), future in zip(jobs, futures):
+        message = lang.get('INFO_COMPRESSING_IMAGE', '...').format(filename=os.path.basename(file_path), size_mb=size / (1024*1024))
+        try:
+            with metrics.get_metrics().timer('preprocess'):
+                final_size = future.result() if future else _compress_file_worker(file_path, target_size_bytes)
+            print(message + lang.get('INFO_COMPRESSION_DONE', '...').format(final_size_mb=final_size / (1024 * 1024)))
+        except Exception as e:
+            print(message + lang.get('ERROR_COMPRESSION_GENERAL', '...').format(error=e))
+            relative_path = os.path.relpath(file_path, source_folder)
+            log_error(error_folder, relative_path, f"Sıkıştırma hatası: {e}", error_class='CompressionError')
+            metrics.get_metrics().add('images_failed')
+            results[i] = False
+    return results
+
+def preprocess_image_data(image_data, relative_path, error_folder, lang):
+    if len(image_data) <= MAX_DOSYA_BOYUTU_MB * 1024 * 1024 or tall_image_size(image_data):
+        return image_data
+
+    message = lang.get('INFO_COMPRESSING_IMAGE', '...').format(filename=relative_path, size_mb=len(image_data) / (1024*1024))
     try:
-        img = Image.open(file_path)
-        if img.mode in ('RGBA', 'P'): img = img.convert('RGB')
-        
-        temp_path = file_path + ".tmp.jpg"
-        quality = 95
-        img.save(temp_path, 'JPEG', quality=quality, optimize=True)
-
-        if os.path.getsize(temp_path) > target_size_bytes:
-            quality = 85
-            while quality >= 75:
-                img.save(temp_path, 'JPEG', quality=quality, optimize=True)
-                if os.path.getsize(temp_path) <= target_size_bytes: break
-                quality -= 5
-        
-        if os.path.getsize(temp_path) > target_size_bytes:
-            width, height = img.size
-            while os.path.getsize(temp_path) > target_size_bytes:
-                width, height = int(width * 0.95), int(height * 0.95)
-                if width < 100 or height < 100: raise Exception("Image too small to compress.")
-                img.resize((width, height), Image.Resampling.LANCZOS).save(temp_path, 'JPEG', quality=75, optimize=True)
-        
-        os.replace(temp_path, file_path)
-        final_size_mb = os.path.getsize(file_path) / (1024 * 1024)
-        print(lang.get('INFO_COMPRESSION_DONE', '...').format(final_size_mb=final_size_mb))
-        return True
+        data = get_process_pool().submit(_compress_data_worker, image_data, HEDEF_BOYUT_MB * 1024 * 1024).result()
+        print(message + lang.get('INFO_COMPRESSION_DONE', '...').format(final_size_mb=len(data) / (1024 * 1024)))
+        return data
     except Exception as e:
-        print(lang.get('ERROR_COMPRESSION_GENERAL', '...').format(error=e))
-        relative_path = os.path.relpath(file_path, source_folder)
-        log_error(error_folder, relative_path, f"Sıkıştırma hatası: {e}")
-        copy_to_error_folder(file_path, source_folder, error_folder)
-        return False
+        print(message + lang.get('ERROR_COMPRESSION_GENERAL', '...').format(error=e))
+        log_error(error_folder, relative_path, f"Sıkıştırma hatası: {e}", error_class='CompressionError')
+        return None
+
+def translated_output_path(relative_path, output_folder):
+    output_subfolder = os.path.join(output_folder, os.path.dirname(relative_path))
+    return os.path.join(output_subfolder, f"{os.path.splitext(os.path.basename(relative_path))[0]}_translated.jpg")
+
+def write_translated_output(content, relative_path, output_folder):
+    output_path = translated_output_path(relative_path, output_folder)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    encoder = output_encoder.get_encoder()
+    if encoder is not None:
+        return encoder.write(content, output_path)
+    with open(output_path, "wb") as f_out: f_out.write(content)
+    return output_path
+
+def request_translation(upload_data, upload_name, mime_type, headers, image_key=None):
+    pool = key_pool.get_pool()
+
+    def send(cancel):
+        if pool is not None:
+            return pool.post(API_URL, headers, upload_name, upload_data, mime_type, image=image_key, cancel=cancel)
+        return api_client.post_image(API_URL, headers, upload_name, upload_data, mime_type, image=image_key, cancel=cancel)
+
+    response, attempts = api_client.hedged(send, len(upload_data))
+    if response.headers.get("success") == "true":
+        return response.content, None, None
+    error_msg = response.content.decode('utf-8', 'ignore')
+    failure = {'status_code': response.status_code, 'error_class': 'HTTPError' if response.status_code >= 400 else 'APIError', 'attempts': attempts}
+    return None, f"API Hatası (Kod: {response.status_code}, Deneme: {attempts}) - Mesaj: {error_msg}", failure
+
+def translate_tiles(image_data, filename, headers, image_key=None):
+    stats = metrics.get_metrics()
+    pool = get_process_pool()
+    with stats.timer('split', image_key):
+        width, tiles = pool.submit(_split_tall_image_worker, image_data, PARCA_MIN_ORANI, PARCA_MAX_ORANI).result()
+    stem = os.path.splitext(filename)[0]
+
+    def request_tile(i, tile):
+        upload_data, mime_type, upload_name = encode_for_upload(tile, f"{stem}_part{i + 1:02d}.jpg")
+        return request_translation(upload_data, upload_name, mime_type, headers, image_key)
 
-def process_single_file(file_path, api_key, model, target_lang, source_folder, output_folder, error_folder, lang):
-    filename = os.path.basename(file_path)
+    executor = get_tile_executor()
+    futures = [executor.submit(request_tile, i, tile) for i, (tile, _) in enumerate(tiles)]
+    stats.add('tiles_uploaded', len(tiles))
+    contents = []
+    for i, future in enumerate(futures):
+        content, error, failure = future.result()
+        if content is None:
+            for pending in futures: pending.cancel()
+            return None, f"Parça {i + 1}/{len(tiles)}: {error}", failure
+        contents.append(content)
+    with stats.timer('stitch', image_key):
+        return pool.submit(_stitch_tiles_worker, contents, [tile_height for _, tile_height in tiles], width).result(), None, None
+
+def translate_data(image_data, relative_path, api_key, model, target_lang, output_folder, error_folder, lang, cache=None):
+    filename = os.path.basename(relative_path)
+    stats = metrics.get_metrics()
+    image_key = translated_output_path(relative_path, output_folder)
+    success, cached = False, False
+    try:
+        tall_size = tall_image_size(image_data)
+        if tall_size:
+            upload_data, font_key = image_data, f"{VARSAYILAN_FONT}|tiles"
+        else:
+            with stats.timer('encode', image_key):
+                upload_data, mime_type, upload_name = encode_for_upload(image_data, filename)
+            font_key = VARSAYILAN_FONT
+        stats.add('bytes_source', len(image_data))
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.make_key(upload_data, model, target_lang, font_key)
+            with stats.timer('cache', image_key):
+                cached_content = cache.get(cache_key)
+            stats.add('cache_hits' if cached_content is not None else 'cache_misses')
+            if cached_content is not None:
+                with stats.timer('write', image_key):
+                    write_translated_output(cached_content, relative_path, output_folder)
+                success, cached = True, True
+                return True, f"-> {lang.get('INFO_CACHE_HIT', 'Found in cache, upload skipped.')}"
+        headers = { "Authorization": f"Bearer {api_key}", "target_lang": target_lang, "translator": model, "font": VARSAYILAN_FONT}
+        if tall_size:
+            content, log_message, failure = translate_tiles(image_data, filename, headers, image_key)
+        else:
+            content, log_message, failure = request_translation(upload_data, upload_name, mime_type, headers, image_key)
+        if content is not None:
+            with stats.timer('write', image_key):
+                write_translated_output(content, relative_path, output_folder)
+                if cache_key is not None:
+                    cache.put(cache_key, content)
+            success = True
+            return True, f"-> {lang.get('INFO_SUCCESS', 'SUCCESS!')}"
+        log_error(error_folder, relative_path, log_message, **failure)
+    except Exception as e:
+        log_message = f"Genel Hata: {e}"
+        log_error(error_folder, relative_path, log_message, error_class=type(e).__name__, attempts=getattr(e, 'attempts', None))
+    finally:
+        stats.finish_image(image_key, success, bytes=len(image_data), cached=cached)
+    return False, f"-> {log_message}"
+
+def translate_file(file_path, api_key, model, target_lang, source_folder, output_folder, error_folder, lang, cache=None):
     relative_path = os.path.relpath(file_path, source_folder)
+    stats = metrics.get_metrics()
     try:
-        with open(file_path, "rb") as image_file:
-            headers = { "Authorization": f"Bearer {api_key}", "target_lang": target_lang, "translator": model, "font": "wildwords"}
-            files = {"file": (filename, image_file, 'image/jpeg')}
-            response = requests.post(API_URL, headers=headers, files=files, timeout=90)
-            if response.headers.get("success") == "true":
-                output_relative_dir = os.path.dirname(relative_path)
-                output_subfolder = os.path.join(output_folder, output_relative_dir)
-                os.makedirs(output_subfolder, exist_ok=True)
-                output_path = os.path.join(output_subfolder, f"{os.path.splitext(filename)[0]}_translated.jpg")
-                with open(output_path, "wb") as f_out: f_out.write(response.content)
-                print(f"-> {lang.get('INFO_SUCCESS', 'SUCCESS!')}")
-                return True
-            else:
-                error_msg = response.content.decode('utf-8', 'ignore')
-                status_code = response.status_code
-                log_message = f"API Hatası (Kod: {status_code}) - Mesaj: {error_msg}"
-                print(f"-> {log_message}")
-                log_error(error_folder, relative_path, log_message)
+        with stats.timer('extract', translated_output_path(relative_path, output_folder)):
+            with open(file_path, "rb") as image_file:
+                image_data = image_file.read()
     except Exception as e:
         log_message = f"Genel Hata: {e}"
-        print(f"-> {log_message}")
-        log_error(error_folder, relative_path, log_message)
+        log_error(error_folder, relative_path, log_message, error_class=type(e).__name__)
+        stats.finish_image(translated_output_path(relative_path, output_folder), False)
+        return False, f"-> {log_message}"
+
+    return translate_data(image_data, relative_path, api_key, model, target_lang, output_folder, error_folder, lang, cache)
+
+def process_single_file(file_path, api_key, model, target_lang, source_folder, output_folder, error_folder, lang, cache=None):
+    success, message = translate_file(file_path, api_key, model, target_lang, source_folder, output_folder, error_folder, lang, cache)
+    print(message)
+    return success
+
+def translate_images(image_paths, api_key, model, target_lang, source_folder, output_folder, error_folder, lang, max_workers=ESZAMANLI_ISTEK_SAYISI, cache=None, journal=None, executor=None, plan=None):
+    plan = plan or {}
+
+    def record(path, result):
+        if journal is not None:
+            journal.set_state(os.path.relpath(path, source_folder), job_journal.CEVRILDI if result[0] else job_journal.BASARISIZ)
+        return result
+
+    def translate_and_record(path):
+        return record(path, translate_file(path, api_key, model, target_lang, source_folder, output_folder, error_folder, lang, cache))
+
+    def apply_plan(path, outcome):
+        kind, original = plan[path]
+        image_data = None
+        if kind == page_filter.BOS:
+            with open(path, 'rb') as f: image_data = f.read()
+        original_relative = os.path.relpath(original, source_folder) if original else None
+        return record(path, apply_page_plan(kind, original_relative, image_data, os.path.relpath(path, source_folder), outcome.get(original, False), output_folder, error_folder, lang))
+
+    total = len(image_paths)
+    results = []
+    stats = metrics.get_metrics()
+    stats.expect(total)
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)))
+    try:
+        futures = [None if path in plan else executor.submit(translate_and_record, path) for path in image_paths]
+        outcome = {}
+        for i, (file_path, future) in enumerate(zip(image_paths, futures)):
+            success, message = future.result() if future is not None else apply_plan(file_path, outcome)
+            outcome[file_path] = success
+            print(lang.get('INFO_PROCESSING', '...').format(i=i+1, total=total, filename=os.path.relpath(file_path, source_folder)) + " " + stats.progress_line(lang))
+            print(message)
+            results.append(success)
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True)
+    for file_path in image_paths:
+        output_encoder.resolve(translated_output_path(os.path.relpath(file_path, source_folder), output_folder))
+    if cache is not None:
+        cache.flush()
+    return results
+
+def translate_archive_stream(filepath, file_ext, extract_dir, names, api_key, model, target_lang, output_folder, error_folder, lang, max_workers=ESZAMANLI_ISTEK_SAYISI, cache=None, journal=None, on_page=None, executor=None, plan=None, only=None):
+    done = {name for name in names if (journal is not None and journal.get_state(name) == job_journal.CEVRILDI) or (only is not None and name not in only)}
+    total = len(names) - len(done)
+    processed = 0
+    plan = plan or {}
+    outcome = {}
+    stats = metrics.get_metrics()
+    stats.expect(total)
+
+    def record(name, result):
+        if journal is not None:
+            journal.set_state(name, job_journal.CEVRILDI if result[0] else job_journal.BASARISIZ)
+        return result
+
+    def read_items(pending):
+        items = iter_archive_images(filepath, file_ext, extract_dir, pending)
+        while True:
+            started = time.perf_counter()
+            item = next(items, None)
+            if item is None: return
+            stats.observe('extract', time.perf_counter() - started, translated_output_path(item[0], output_folder))
+            yield item
+
+    def preprocess(name, data):
+        # The upload encoder already brings oversized pages under the limit in one pass; compressing them here first would encode them twice.
+        if name in plan or _upload_settings['enabled']:
+            return data
+        with stats.timer('preprocess', translated_output_path(name, output_folder)):
+            data = preprocess_image_data(data, name, error_folder, lang)
+        if data is None:
+            stats.finish_image(translated_output_path(name, output_folder), False)
+            if journal is not None:
+                journal.set_state(name, job_journal.BASARISIZ)
+        return data
+
+    def translate(name, data):
+        if name in plan:
+            kind, _ = plan[name]
+            # Duplicates are resolved in report(), once their original has been reported in page order.
+            return record(name, apply_page_plan(kind, None, data, name, False, output_folder, error_folder, lang)) if kind == page_filter.BOS else (False, None)
+        return record(name, translate_data(data, name, api_key, model, target_lang, output_folder, error_folder, lang, cache))
+
+    def missing(name):
+        log_error(error_folder, name, stream_pipeline.EKSIK_SAYFA_MESAJI)
+        stats.finish_image(translated_output_path(name, output_folder), False)
+        return record(name, (False, stream_pipeline.EKSIK_SAYFA_MESAJI))
+
+    def report(index, name, success, message):
+        nonlocal processed
+        if name in plan and plan[name][0] == page_filter.KOPYA:
+            original = plan[name][1]
+            success, message = record(name, apply_page_plan(page_filter.KOPYA, original, None, name, outcome.get(original, False), output_folder, error_folder, lang))
+        outcome[name] = success
+        if message is not None:
+            processed += 1
+            print(lang.get('INFO_PROCESSING', '...').format(i=processed, total=total, filename=name) + " " + stats.progress_line(lang))
+            print(message)
+        if on_page is not None:
+            # Waits for this page's re-encode only; later pages keep uploading and encoding meanwhile.
+            translated_path = output_encoder.resolve(translated_output_path(name, output_folder)) if success else None
+            with stats.timer('repack'):
+                on_page(name, translated_path)
+
+    stream_pipeline.run(names, read_items, preprocess, translate, report, max_workers, done, preprocess_workers=os.cpu_count(), executor=executor, on_missing=missing)
+    if cache is not None:
+        cache.flush()
+
+def load_models(models_path="models.env"):
+    models = {}
+    with open(models_path, "r", encoding='utf-8') as f:
+        for line in f:
+            if line.strip() and not line.startswith("#"): key, value = line.strip().split('=', 1); models[key] = value
+    return models
+
+def estimate_cost(image_count, cost):
+    cost_per_image_str = cost.replace('+', '')
+    if not cost_per_image_str.isdigit():
+        return None
+    return image_count * int(cost_per_image_str)
+
+def job_credits(summary, cost):
+    return estimate_cost(summary.get('requests', summary['translated'] - summary.get('skipped', 0)), cost)
+
+def print_cost_estimate(image_count, cost, lang, request_count=None):
+    request_count = image_count if request_count is None else request_count
+    total_cost = estimate_cost(request_count, cost)
+    if total_cost is None:
+        return
+    if request_count > image_count:
+        print(lang.get('INFO_TILED_REQUESTS', '...').format(count=image_count, requests=request_count))
+    cost_per_image = int(cost.replace('+', ''))
+    if '+' in cost:
+        print(lang.get('INFO_BASE_COST_ESTIMATE', '...').format(count=request_count, base_cost=cost_per_image, total_cost=total_cost))
+    else:
+        print(lang.get('INFO_TOTAL_COST', '...').format(count=request_count, cost_per_image=cost_per_image, total_cost=total_cost))
+
+def configure_api(profile, workers):
+    api_client.configure(rate=profile.get('requests_per_second'), pool_size=workers, adaptive_timeouts=profile.get('adaptive_timeouts', True), hedge_percentile=profile.get('hedge_percentile'), hedge_budget=profile.get('hedge_budget'))
+
+def open_output_encoder(profile, lang):
+    enabled = profile.get('output_transcoding', False)
+    fmt = str(profile.get('output_format', output_encoder.VARSAYILAN_FORMAT)).lower()
+    if enabled and (fmt not in output_encoder.FORMAT_UZANTILARI or not output_encoder.format_available(fmt)):
+        print(lang.get('WARN_OUTPUT_FORMAT_UNAVAILABLE', '...').format(format=fmt))
+        fmt = output_encoder.VARSAYILAN_FORMAT
+    return output_encoder.configure(
+        enabled,
+        fmt,
+        profile.get('output_quality'),
+        profile.get('output_max_width', 0),
+        profile.get('output_max_height', 0),
+        profile.get('output_min_saving', output_encoder.MIN_KAZANC_ORANI),
+        profile.get('output_grayscale', True),
+        profile.get('output_transcode_workers'),
+    )
+
+def close_output_encoder(lang):
+    encoder = output_encoder.get_encoder()
+    if encoder is None:
+        return
+    encoder.close()
+    report = encoder.report()
+    if report['pages'] or report['failed']:
+        print(lang.get('INFO_OUTPUT_TRANSCODE_STATS', '...').format(**report))
+
+def open_translation_cache(profile):
+    if not profile.get('cache_enabled', True):
+        return None
+    import translation_cache
+    return translation_cache.TranslationCache(max_size_mb=profile.get('cache_max_mb', translation_cache.VARSAYILAN_CACHE_BOYUTU_MB))
+
+def open_metrics(profile):
+    return metrics.configure(profile.get('metrics_enabled', True), profile.get('metrics_dir', metrics.METRICS_DIR))
 
-    copy_to_error_folder(file_path, source_folder, error_folder)
-    return False
+def close_metrics(lang):
+    stats = metrics.get_metrics()
+    stats.close()
+    snapshot = stats.snapshot()
+    if snapshot['stages']:
+        breakdown = ", ".join(f"{stage} {values['seconds']:.1f}s" for stage, values in sorted(snapshot['stages'].items(), key=lambda item: -item[1]['seconds']))
+        print(lang.get('INFO_METRICS_STAGES', '...').format(stages=breakdown))
+    if stats.jsonl_path:
+        print(lang.get('INFO_METRICS_SAVED', '...').format(jsonl=stats.jsonl_path, prom=stats.prom_path))
+
+def open_failures(profile):
+    return failures.configure(profile.get('failure_manifest_enabled', True), profile.get('failures_dir', failures.FAILURES_DIR))
+
+def close_failures(lang):
+    manifest = failures.get_manifest()
+    manifest.close()
+    close_error_logs()
+    if manifest.count:
+        print(lang.get('INFO_FAILURES_SAVED', '...').format(count=manifest.count, path=manifest.path))
+
+def open_key_pool(profile, api_key, lang):
+    entries = key_pool.load_keys(profile)
+    if entries and api_key and api_key not in [entry['key'] for entry in entries]:
+        entries.append({'key': api_key})
+    costs = load_models() if os.path.exists("models.env") else {}
+    return key_pool.configure(entries, profile.get('requests_per_second'), profile.get('max_workers', ESZAMANLI_ISTEK_SAYISI), costs, lang)
+
+def close_key_pool(lang):
+    pool = key_pool.get_pool()
+    if pool is None:
+        return
+    print(f"\n--- {lang.get('HEADER_KEY_STATS', '---')} ---")
+    for usage in pool.report():
+        print(lang.get('INFO_KEY_STATS', '...').format(**usage))
+
+def print_cache_stats(cache, lang):
+    if cache is None:
+        return
+    stats = cache.stats()
+    print(lang.get('INFO_CACHE_STATS', '...').format(**stats))
 
 def sorted_alphanumeric(data):
-    import re
     convert = lambda text: int(text) if text.isdigit() else text.lower()
     alphanum_key = lambda key: [convert(c) for c in re.split('([0-9]+)', key)]
     return sorted(data, key=alphanum_key)
 
-def extract_pdf(filepath, temp_dir):
-    doc = fitz.open(filepath)
-    for i, page in enumerate(doc):
-        pix = page.get_pixmap(dpi=300)
-        pix.save(os.path.join(temp_dir, f"page_{i:04d}.png"))
-    doc.close()
-
-def extract_zip(filepath, temp_dir):
-    with zipfile.ZipFile(filepath, 'r') as zf:
-        image_files = [name for name in zf.namelist() if not name.startswith('__MACOSX') and name.lower().endswith(('.png', '.jpg', '.jpeg'))]
-        for name in sorted_alphanumeric(image_files):
-            zf.extract(name, temp_dir)
-
-def extract_rar(filepath, temp_dir):
-    with rarfile.RarFile(filepath, 'r') as rf:
-        image_files = [name for name in rf.namelist() if name.lower().endswith(('.png', '.jpg', '.jpeg'))]
-        for name in sorted_alphanumeric(image_files):
-            rf.extract(name, temp_dir)
-    
-def extract_7z(filepath, temp_dir):
-    with py7zr.SevenZipFile(filepath, mode='r') as z:
-        z.extractall(path=temp_dir)
-
-def extract_epub(filepath, temp_dir):
-    book = epub.read_epub(filepath)
-    image_map = {}
-    i = 0
-    for item in book.get_items_of_type(epub.ITEM_IMAGE):
-        filename = item.get_name()
-        ext = os.path.splitext(filename)[1]
-        output_path = os.path.join(temp_dir, f"page_{i:04d}{ext}")
-        with open(output_path, 'wb') as f:
-            f.write(item.get_content())
-        image_map[output_path] = filename
-        i += 1
-    return image_map
-
-def repack_pdf(image_folder, output_path):
-    images = []
-    image_files = sorted_alphanumeric([os.path.join(image_folder, f) for f in os.listdir(image_folder) if f.lower().endswith(('.jpg', '.jpeg', '.png'))])
-    for path in image_files:
-        img = Image.open(path)
-        if img.mode == 'RGBA': img = img.convert('RGB')
-        images.append(img)
-    if images:
-        images[0].save(output_path, save_all=True, append_images=images[1:])
-
-def repack_cbz(image_folder, output_path):
-    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-        image_files = sorted_alphanumeric([f for f in os.listdir(image_folder) if f.lower().endswith(('.jpg', '.jpeg', '.png'))])
-        for filename in image_files:
-            zf.write(os.path.join(image_folder, filename), arcname=filename)
-
-def repack_epub(original_epub_path, translated_folder, image_map, output_path):
-    book = epub.read_epub(original_epub_path)
-    for local_path, epub_internal_name in image_map.items():
-        base_name = os.path.splitext(os.path.basename(local_path))[0]
-        translated_filename = f"{base_name}_translated.jpg"
-        translated_path = os.path.join(translated_folder, translated_filename)
-        
-        if os.path.exists(translated_path):
-            item = book.get_item_with_href(epub_internal_name)
-            if item:
-                with open(translated_path, 'rb') as f:
-                    item.content = f.read()
-                item.media_type = 'image/jpeg'
-                new_filename = os.path.splitext(item.file_name)[0] + ".jpg"
-                item.file_name = new_filename
-
-    epub.write_epub(output_path, book, {})
+def list_archive_images(filepath, file_ext, extract_dir):
+    return formats.for_extension(file_ext).list_pages(filepath, extract_dir)
+
+def iter_archive_images(filepath, file_ext, extract_dir, names):
+    return formats.for_extension(file_ext).iter_pages(filepath, extract_dir, names)
+
+def _collect_signatures(tasks):
+    pool = get_process_pool()
+    signatures = {}
+    window = []
+    for key, worker, args in tasks:
+        window.append((key, pool.submit(worker, *args)))
+        if len(window) >= (os.cpu_count() or 1) * 4:
+            key, future = window.pop(0)
+            signatures[key] = _signature_result(future)
+    for key, future in window:
+        signatures[key] = _signature_result(future)
+    return signatures
+
+def _signature_result(future):
+    try:
+        return future.result()
+    except Exception:
+        return None
+
+def plan_image_files(image_paths, skip_blank=True, skip_duplicates=True):
+    if not (skip_blank or skip_duplicates) or not image_paths:
+        return {}
+    with metrics.get_metrics().timer('analyze'):
+        signatures = _collect_signatures((path, page_filter.signature_from_file, (path,)) for path in image_paths)
+        return page_filter.plan_pages(image_paths, signatures, skip_blank, skip_duplicates)
+
+def plan_archive_pages(filepath, file_ext, extract_dir, names, skip_blank=True, skip_duplicates=True):
+    if not (skip_blank or skip_duplicates) or not names:
+        return {}
+    with metrics.get_metrics().timer('analyze'):
+        signatures = _collect_signatures(formats.for_extension(file_ext).signature_tasks(filepath, extract_dir, names))
+        return page_filter.plan_pages(names, signatures, skip_blank, skip_duplicates)
+
+def print_skipped_pages(plan, lang):
+    blank, duplicates = page_filter.count_skipped(plan)
+    if blank or duplicates:
+        print(lang.get('INFO_PAGES_SKIPPED', '...').format(blank=blank, duplicates=duplicates))
+
+def write_passthrough_output(image_data, relative_path, output_folder):
+    if not image_data.startswith(b"\xff\xd8"):
+        with Image.open(io.BytesIO(image_data)) as img:
+            image_data = _encode_jpeg(img if img.mode in ('RGB', 'L') else img.convert('RGB'), 95)
+    return write_translated_output(image_data, relative_path, output_folder)
+
+def copy_translated_output(source_relative_path, relative_path, output_folder):
+    source_path = output_encoder.resolve(translated_output_path(source_relative_path, output_folder))
+    output_path = os.path.splitext(translated_output_path(relative_path, output_folder))[0] + os.path.splitext(source_path)[1]
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    shutil.copyfile(source_path, output_path)
+    output_encoder.remove_alternates(output_path)
+    return output_path
+
+def apply_page_plan(kind, original, image_data, relative_path, original_success, output_folder, error_folder, lang):
+    stats = metrics.get_metrics()
+    image_key = translated_output_path(relative_path, output_folder)
+    stats.add('pages_skipped')
+    try:
+        if kind == page_filter.BOS:
+            write_passthrough_output(image_data, relative_path, output_folder)
+            success, message = True, f"-> {lang.get('INFO_PAGE_BLANK', 'Blank page, passed through without upload.')}"
+        elif original_success:
+            copy_translated_output(original, relative_path, output_folder)
+            success, message = True, f"-> {lang.get('INFO_PAGE_DUPLICATE', 'Duplicate of {original}, its translation was reused.').format(original=original)}"
+        else:
+            log_error(error_folder, relative_path, f"Kopya sayfa, asıl sayfa çevrilemedi: {original}", error_class='DuplicateOfFailed', original=original)
+            success, message = False, f"-> {lang.get('ERROR_PAGE_DUPLICATE_FAILED', 'Duplicate of {original}, which failed.').format(original=original)}"
+    except Exception as e:
+        log_error(error_folder, relative_path, f"Genel Hata: {e}", error_class=type(e).__name__)
+        success, message = False, f"-> Genel Hata: {e}"
+    stats.finish_image(image_key, success, skipped=kind)
+    return success, message
@@ -0,0 +1,328 @@
+import os
+import json
+import time
+import uuid
+import queue
+import signal
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+import core_logic
+import archive_mode
+import batch_mode
+import job_journal
+import key_pool
+import metrics
+import formats
+import output_encoder
+
+DAEMON_DIR = ".daemon"
+KUYRUK_DOSYASI = "queue.jsonl"
+GECMIS_IS_SAYISI = 500
+VARSAYILAN_PORT = 8766
+SIRADA = "queued"
+CALISIYOR = "running"
+BITTI = "done"
+HATA = "error"
+IPTAL = "cancelled"
+
+def detect_kind(path):
+    if os.path.isdir(path):
+        return 'folder'
+    if os.path.isfile(path) and formats.for_path(path) is not None:
+        return 'archive'
+    if os.path.isfile(path) and path.lower().endswith(core_logic.GECERLI_UZANTILAR):
+        return 'image'
+    return None
+
+class JobQueue:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.pending = queue.Queue()
+        self.stopped = False
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get('type') == 'job':
+                        self.jobs[record['id']] = {k: v for k, v in record.items() if k != 'type'}
+                    elif record.get('type') == 'update' and record['id'] in self.jobs:
+                        self.jobs[record['id']].update(record['fields'])
+        # Jobs cut short by a restart go back in the queue; their job journals resume the work already done.
+        for job in self.jobs.values():
+            if job['state'] in (SIRADA, CALISIYOR):
+                job['state'] = SIRADA
+                self.pending.put(job['id'])
+        finished = [job_id for job_id, job in self.jobs.items() if job['state'] != SIRADA]
+        for job_id in finished[:-GECMIS_IS_SAYISI]:
+            del self.jobs[job_id]
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for job in self.jobs.values():
+                f.write(json.dumps(dict(type='job', **job), ensure_ascii=False) + "\n")
+        os.replace(temp_path, path)
+
+    def _append(self, record):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _update(self, job_id, **fields):
+        self.jobs[job_id].update(fields)
+        self._append({'type': 'update', 'id': job_id, 'fields': fields})
+
+    def submit(self, path, kind, model, target_lang):
+        job = {'id': uuid.uuid4().hex[:12], 'path': path, 'kind': kind, 'model': model, 'target_lang': target_lang, 'state': SIRADA, 'submitted': time.time(), 'started': None, 'finished': None, 'summary': None}
+        with self.lock:
+            self.jobs[job['id']] = job
+            self._append(dict(type='job', **job))
+        self.pending.put(job['id'])
+        return dict(job)
+
+    def next(self):
+        while True:
+            job_id = self.pending.get()
+            if job_id is None or self.stopped:
+                return None
+            with self.lock:
+                job = self.jobs.get(job_id)
+                if job is None or job['state'] != SIRADA:
+                    continue
+                self._update(job_id, state=CALISIYOR, started=time.time())
+                return dict(job)
+
+    def finish(self, job_id, summary):
+        state = BITTI if summary['status'] in ('done', 'empty') else HATA
+        with self.lock:
+            self._update(job_id, state=state, finished=time.time(), summary=summary)
+
+    def cancel(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job['state'] != SIRADA:
+                return False
+            self._update(job_id, state=IPTAL, finished=time.time())
+            return True
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list(self):
+        with self.lock:
+            return [dict(job) for job in self.jobs.values()]
+
+    def counts(self):
+        with self.lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job['state']] = counts.get(job['state'], 0) + 1
+            return counts
+
+    def stop(self, workers):
+        self.stopped = True
+        for _ in range(workers):
+            self.pending.put(None)
+
+def job_progress(job):
+    if job['state'] != CALISIYOR or job['kind'] == 'image':
+        return None
+    # The running job's journal is read from memory; polling never opens (or repairs) the file it is appending to.
+    journal = job_journal.live_journal(job['kind'], job['path'], job['model'], job['target_lang'])
+    return journal.progress() if journal is not None else None
+
+class TranslationDaemon:
+    def __init__(self, settings, lang, profile, job_count, queue_path=os.path.join(DAEMON_DIR, KUYRUK_DOSYASI)):
+        self.settings = settings
+        self.lang = lang
+        self.profile = profile
+        self.job_count = max(1, int(job_count))
+        self.queue = JobQueue(queue_path)
+        self.models = core_logic.load_models() if os.path.exists("models.env") else {}
+        self.cache = None
+        self.upload_executor = None
+        self.threads = []
+
+    def start(self):
+        core_logic.configure_api(self.profile, self.settings['workers'])
+        self.cache = core_logic.open_translation_cache(self.profile)
+        core_logic.open_metrics(self.profile)
+        core_logic.open_key_pool(self.profile, self.settings['api_key'], self.lang)
+        core_logic.open_output_encoder(self.profile, self.lang)
+        core_logic.open_failures(self.profile)
+        self.upload_executor = ThreadPoolExecutor(max_workers=max(1, self.settings['workers']))
+        self.threads = [threading.Thread(target=self.worker, daemon=True) for _ in range(self.job_count)]
+        for thread in self.threads: thread.start()
+
+    def worker(self):
+        while True:
+            job = self.queue.next()
+            if job is None:
+                return
+            print(self.lang.get('INFO_DAEMON_JOB_STARTED', '...').format(id=job['id'], kind=job['kind'], path=job['path']))
+            entry = {'path': job['path'], 'kind': job['kind'], 'model': job['model'], 'target_lang': job['target_lang']}
+            summary = batch_mode.run_job(entry, self.settings, self.lang, self.cache, self.upload_executor)
+            summary['credits'] = core_logic.job_credits(summary, self.models.get(job['model'], "0"))
+            self.queue.finish(job['id'], summary)
+            print(self.lang.get('INFO_DAEMON_JOB_DONE', '...').format(id=job['id'], **summary))
+
+    def submit(self, request):
+        path = request.get('path')
+        if not path or not os.path.exists(path):
+            raise ValueError(f"path not found: {path}")
+        path = os.path.abspath(path)
+        kind = detect_kind(path)
+        if kind is None:
+            raise ValueError(f"unsupported path: {path}")
+        model = request.get('model') or self.settings['model']
+        if not model:
+            raise ValueError("no model given and none in profile.json")
+        job = self.queue.submit(path, kind, model, request.get('target_lang') or self.settings['target_lang'])
+        print(self.lang.get('INFO_DAEMON_JOB_QUEUED', '...').format(id=job['id'], kind=kind, path=path))
+        return job
+
+    def describe(self, job):
+        job['progress'] = job_progress(job)
+        return job
+
+    def status(self):
+        stats = metrics.get_metrics()
+        snapshot = stats.snapshot()
+        return {'jobs': self.queue.counts(), 'workers': self.settings['workers'], 'parallel_jobs': self.job_count, 'rate': round(stats.rate(), 3), 'images_done': snapshot['done'], 'images_expected': snapshot['expected'], 'counters': snapshot['counters'], 'uptime': round(snapshot['seconds'], 1), 'keys': key_pool.get_pool().report() if key_pool.get_pool() else None, 'transcode': output_encoder.get_encoder().report() if output_encoder.get_encoder() else None}
+
+    def stop(self):
+        self.queue.stop(len(self.threads))
+        for thread in self.threads: thread.join()
+        self.upload_executor.shutdown(wait=True)
+        core_logic.close_output_encoder(self.lang)
+        core_logic.close_key_pool(self.lang)
+        core_logic.print_cache_stats(self.cache, self.lang)
+        core_logic.close_metrics(self.lang)
+        core_logic.close_failures(self.lang)
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _job_id(self):
+        parts = self.path.split('?', 1)[0].strip('/').split('/')
+        return parts[1] if len(parts) == 2 and parts[0] == 'jobs' else None
+
+    def do_GET(self):
+        daemon = self.server.translation_daemon
+        route = self.path.split('?', 1)[0].rstrip('/')
+        if route == '/status':
+            self._send_json(200, daemon.status())
+        elif route == '/jobs':
+            self._send_json(200, {'jobs': daemon.queue.list()})
+        elif self._job_id():
+            job = daemon.queue.get(self._job_id())
+            self._send_json(200, daemon.describe(job)) if job else self._send_json(404, {'error': 'job not found'})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path.split('?', 1)[0].rstrip('/') != '/jobs':
+            self._send_json(404, {'error': 'not found'})
+            return
+        try:
+            request = self._read_json()
+            requests_list = request if isinstance(request, list) else [request]
+            jobs = [self.server.translation_daemon.submit(item) for item in requests_list]
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        self._send_json(202, jobs if isinstance(request, list) else jobs[0])
+
+    def do_DELETE(self):
+        job_id = self._job_id()
+        if job_id and self.server.translation_daemon.queue.cancel(job_id):
+            self._send_json(200, {'id': job_id, 'state': IPTAL})
+        elif job_id and self.server.translation_daemon.queue.get(job_id):
+            self._send_json(409, {'error': 'only queued jobs can be cancelled'})
+        else:
+            self._send_json(404, {'error': 'job not found'})
+
+    def log_message(self, format, *args):
+        pass
+
+class DaemonServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host, port, translation_daemon):
+        super().__init__((host, port), DaemonHandler)
+        self.translation_daemon = translation_daemon
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+class UnixDaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, translation_daemon):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, DaemonHandler)
+        self.translation_daemon = translation_daemon
+
+    @property
+    def url(self):
+        return f"unix:{self.server_address}"
+
+def start_daemon(args, lang, profile):
+    print(f"--- {lang.get('HEADER_DAEMON', '---')} ---")
+    core_logic.configure_upload_encoder(profile)
+    load_dotenv(dotenv_path="api.env")
+    api_key = args.api_key or os.getenv("API_KEY") or key_pool.default_key(profile)
+    if not api_key:
+        print(lang.get('ERROR_BATCH_NO_API_KEY', '...')); return 1
+
+    workers = int(args.workers or profile.get('max_workers', core_logic.ESZAMANLI_ISTEK_SAYISI))
+    settings = {
+        'model': args.model or profile.get('model_name'),
+        'target_lang': args.target_lang or profile.get('target_language') or "en",
+        'api_key': api_key,
+        'workers': workers,
+        'profile': profile,
+        'output_dir': args.output_dir or archive_mode.ARCHIVE_OUTPUT_DIR,
+        'skip_blank': profile.get('skip_blank_pages', True),
+        'skip_duplicates': profile.get('skip_duplicate_pages', True),
+    }
+    daemon = TranslationDaemon(settings, lang, profile, args.jobs or batch_mode.ESZAMANLI_IS_SAYISI)
+    server = UnixDaemonServer(args.socket, daemon) if args.socket else DaemonServer("127.0.0.1", args.port or VARSAYILAN_PORT, daemon)
+    daemon.start()
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown, daemon=True).start())
+    print(lang.get('INFO_DAEMON_LISTENING', '...').format(url=server.url, queued=daemon.queue.counts().get(SIRADA, 0)))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+        print(lang.get('INFO_DAEMON_STOPPING', '...'))
+        daemon.stop()
+    return 0
@@ -0,0 +1,109 @@
+import os
+import json
+import time
+import threading
+import api_client
+
+FAILURES_DIR = ".failures"
+AG_HATALARI = ('ConnectionError', 'ConnectTimeout', 'ReadTimeout', 'Timeout', 'ChunkedEncodingError', 'SSLError')
+
+def is_retryable(status_code=None, error_class=None):
+    if status_code is not None:
+        return status_code in api_client.YENIDEN_DENENECEK_KODLAR
+    return error_class in AG_HATALARI or error_class == 'KeyPoolExhausted'
+
+class FailureManifest:
+    def __init__(self, failures_dir=None):
+        self.lock = threading.Lock()
+        self.path = os.path.join(failures_dir, f"run_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.jsonl") if failures_dir else None
+        self.file = None
+        self.count = 0
+        self.retryable = {}
+
+    def record(self, context, page, message, status_code=None, error_class=None, attempts=None, original=None):
+        if self.path is None:
+            return
+        with self.lock:
+            if original is not None:
+                # A duplicate page is worth retrying exactly when the page it copies was.
+                retryable = self.retryable.get((context['job_id'], original), True)
+            else:
+                retryable = is_retryable(status_code, error_class)
+            self.retryable[(context['job_id'], page)] = retryable
+            record = {
+                'ts': round(time.time(), 3),
+                'job_id': context['job_id'],
+                'kind': context['kind'],
+                'source': context['source'],
+                'page': page,
+                'path': os.path.join(context['source'], page) if context['kind'] == 'folder' else context['source'],
+                'status_code': status_code,
+                'error_class': error_class,
+                'attempts': attempts,
+                'retryable': retryable,
+                'message': message,
+            }
+            if original is not None:
+                record['original'] = original
+            if self.file is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self.file = open(self.path, 'a', encoding='utf-8', buffering=1)
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.count += 1
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+_manifest = FailureManifest()
+_jobs = {}
+_state_lock = threading.Lock()
+
+def configure(enabled=True, failures_dir=FAILURES_DIR):
+    global _manifest
+    with _state_lock:
+        _manifest = FailureManifest(failures_dir if enabled else None)
+        return _manifest
+
+def get_manifest():
+    return _manifest
+
+def register_job(error_folder, journal):
+    header = journal.header
+    with _state_lock:
+        _jobs[os.path.abspath(error_folder)] = {'job_id': header['job_id'], 'kind': header['kind'], 'source': header['source']}
+
+def record(error_folder, page, message, status_code=None, error_class=None, attempts=None, original=None):
+    context = _jobs.get(os.path.abspath(error_folder))
+    if context is not None:
+        _manifest.record(context, page, message, status_code, error_class, attempts, original)
+
+def list_manifests(failures_dir=FAILURES_DIR):
+    if not os.path.isdir(failures_dir):
+        return []
+    names = sorted((name for name in os.listdir(failures_dir) if name.startswith("run_") and name.endswith(".jsonl")), reverse=True)
+    return [os.path.join(failures_dir, name) for name in names]
+
+def load(path):
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+def group_by_job(records):
+    latest = {}
+    for record in records:
+        latest[(record['job_id'], record['page'])] = record
+    retry, permanent = {}, 0
+    for record in latest.values():
+        if record['retryable']:
+            retry.setdefault(record['job_id'], []).append(record)
+        else:
+            permanent += 1
+    return retry, permanent
@@ -0,0 +1,786 @@
+import os
+import io
+import re
+import math
+import zlib
+import queue
+import shutil
+import struct
+import copy
+import threading
+import posixpath
+import subprocess
+import tempfile
+import zipfile
+import codecs
+from collections import OrderedDict
+from urllib.parse import quote, unquote
+from PIL import Image
+import core_logic
+import page_filter
+import output_encoder
+
+PDF_HEDEF_PIKSEL = 9_000_000
+PDF_MIN_DPI = 72
+PDF_MAX_DPI = 300
+PDF_JPEG_KALITESI = 92
+SIKISTIRILMIS_UZANTILAR = ('.jpg', '.jpeg', '.png', '.webp', '.avif')
+TEKIL_OKUMA_SINIRI = 8
+SAYFA_KUYRUGU = 8
+PDF_ACIK_BELGE_SINIRI = 4
+EPUB_MEDYA_TURLERI = {'.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png', '.webp': 'image/webp', '.avif': 'image/avif'}
+
+def is_archive_image(name):
+    return not name.startswith('__MACOSX') and name.lower().endswith(('.png', '.jpg', '.jpeg'))
+
+_pdf_documents = OrderedDict()
+
+def _open_pdf(filepath):
+    # Pool workers outlive jobs: documents are keyed on the file's identity, so a PDF replaced at the same
+    # path is reopened, and only the last few stay open.
+    stat = os.stat(filepath)
+    key = (os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size)
+    doc = _pdf_documents.get(key)
+    if doc is not None:
+        _pdf_documents.move_to_end(key)
+        return doc
+    for stale in [other for other in _pdf_documents if other[0] == key[0]]:
+        _pdf_documents.pop(stale).close()
+    import fitz
+    doc = _pdf_documents[key] = fitz.open(filepath)
+    while len(_pdf_documents) > PDF_ACIK_BELGE_SINIRI:
+        _pdf_documents.popitem(last=False)[1].close()
+    return doc
+
+def _close_pdf_worker(filepath):
+    path = os.path.abspath(filepath)
+    for key in [key for key in _pdf_documents if key[0] == path]:
+        _pdf_documents.pop(key).close()
+
+def release_pdf(filepath):
+    # One close task per pool worker; a worker that misses it drops the document on eviction instead.
+    pool = core_logic.get_process_pool()
+    for future in [pool.submit(_close_pdf_worker, filepath) for _ in range(os.cpu_count() or 1)]:
+        future.result()
+
+def pdf_page_dpi(page):
+    width_in, height_in = page.rect.width / 72, page.rect.height / 72
+    if width_in <= 0 or height_in <= 0:
+        return PDF_MAX_DPI
+    dpi = int(math.sqrt(PDF_HEDEF_PIKSEL / (width_in * height_in)))
+    return min(max(dpi, PDF_MIN_DPI), PDF_MAX_DPI)
+
+def _full_page_jpeg(doc, page):
+    images = page.get_images(full=True)
+    if len(images) != 1:
+        return None
+    xref, smask = images[0][0], images[0][1]
+    if smask:
+        return None
+    rects = page.get_image_rects(xref)
+    page_area = abs(page.rect)
+    if not rects or page_area == 0 or abs(rects[0] & page.rect) < page_area * 0.95:
+        return None
+    info = doc.extract_image(xref)
+    if not info or info.get('ext') not in ('jpeg', 'jpg') or info.get('colorspace') not in (1, 3):
+        return None
+    return info['image']
+
+def render_pdf_page(doc, page_number):
+    page = doc[page_number]
+    data = _full_page_jpeg(doc, page)
+    if data is not None:
+        return data
+    pix = page.get_pixmap(dpi=pdf_page_dpi(page))
+    return pix.tobytes("jpeg", jpg_quality=PDF_JPEG_KALITESI)
+
+def _render_pdf_page_worker(filepath, page_number):
+    return render_pdf_page(_open_pdf(filepath), page_number)
+
+def _pdf_page_signature_worker(filepath, page_number):
+    import fitz
+    page = _open_pdf(filepath)[page_number]
+    zoom = page_filter.BOS_ORNEK_GENISLIGI / max(page.rect.width, 1)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY)
+    return page_filter.signature_from_image(Image.frombytes('L', (pix.width, pix.height), pix.samples))
+
+
+def _write_pdf_pages(doc, page_numbers, temp_dir):
+    for i in page_numbers:
+        with open(os.path.join(temp_dir, f"page_{i:04d}.jpg"), 'wb') as f:
+            f.write(render_pdf_page(doc, i))
+
+def _render_pdf_pages_worker(filepath, page_numbers, temp_dir):
+    _write_pdf_pages(_open_pdf(filepath), page_numbers, temp_dir)
+
+def extract_pdf(filepath, temp_dir):
+    import fitz
+    with fitz.open(filepath) as doc:
+        page_count = doc.page_count
+        worker_count = max(1, min(os.cpu_count() or 1, page_count))
+        if worker_count == 1:
+            _write_pdf_pages(doc, range(page_count), temp_dir)
+            return
+    chunks = [list(range(i, page_count, worker_count)) for i in range(worker_count)]
+    pool = core_logic.get_process_pool()
+    for future in [pool.submit(_render_pdf_pages_worker, filepath, chunk, temp_dir) for chunk in chunks]:
+        future.result()
+
+def extract_zip(filepath, temp_dir):
+    with zipfile.ZipFile(filepath, 'r') as zf:
+        image_files = [name for name in zf.namelist() if is_archive_image(name)]
+        for name in core_logic.sorted_alphanumeric(image_files):
+            zf.extract(name, temp_dir)
+
+def _read_exact(stream, size):
+    chunks, remaining = [], size
+    while remaining:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+def _rar_single_pass(filepath, members, wanted):
+    import rarfile
+    setup = rarfile.tool_setup()
+    with tempfile.TemporaryFile() as errors:
+        # One tool process prints every member to stdout in archive order; the stream is cut by the sizes in the headers.
+        # An absolute path cannot be mistaken for an option, and "--" would break bsdtar's "-f".
+        cmdline = setup.get_cmdline("open_cmd", None, nodash=True) + [os.path.abspath(filepath)]
+        process = subprocess.Popen(cmdline, stdout=subprocess.PIPE, stderr=errors, stdin=subprocess.DEVNULL)
+        try:
+            for info in members:
+                data = _read_exact(process.stdout, info.file_size)
+                if len(data) != info.file_size:
+                    process.wait()
+                    errors.seek(0)
+                    rarfile.check_returncode(process.returncode, errors.read().decode('utf-8', 'ignore').strip(), setup.get_errmap())
+                    raise rarfile.BadRarFile(f"{info.filename}: arşiv akışı erken bitti")
+                if info.CRC is not None and zlib.crc32(data) != info.CRC:
+                    raise rarfile.BadRarFile(f"{info.filename}: CRC hatası")
+                if info.filename in wanted:
+                    yield info.filename, data
+            process.stdout.close()
+            process.wait()
+            errors.seek(0)
+            rarfile.check_returncode(process.returncode, errors.read().decode('utf-8', 'ignore').strip(), setup.get_errmap())
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+def iter_rar_images(filepath, names):
+    import rarfile
+    wanted = set(names)
+    with rarfile.RarFile(filepath, 'r') as rf:
+        infos = rf.infolist()
+        targets = [info for info in infos if info.filename in wanted]
+        # Stored pages are read straight from the file without a helper process, and a few pages of a non-solid archive are cheaper one by one.
+        per_member = all(info.compress_type == rarfile.RAR_M0 for info in targets) or (not rf.is_solid() and len(targets) <= TEKIL_OKUMA_SINIRI)
+        per_member = per_member or rf.needs_password() or any(not (info.is_file() or info.is_dir()) for info in infos)
+        if per_member:
+            for info in targets:
+                yield info.filename, rf.read(info)
+            return
+        members = [info for info in infos if info.is_file()]
+    yield from _rar_single_pass(filepath, members, wanted)
+
+def iter_7z_images(filepath, names):
+    import py7zr
+    from py7zr.io import Py7zBytesIO, WriterFactory
+    pages = queue.Queue(maxsize=SAYFA_KUYRUGU)
+    stop = threading.Event()
+    done = object()
+
+    def hand_over(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        raise InterruptedError("7z okuma durduruldu")
+
+    class PageFactory(WriterFactory):
+        # py7zr asks a thread for its next writer only after that thread's previous member is complete;
+        # non-solid archives are decompressed one folder per thread.
+        def __init__(self):
+            self.current = {}
+            self.lock = threading.Lock()
+
+        def create(self, filename):
+            self.hand_over(threading.get_ident())
+            product = Py7zBytesIO(filename, float('inf'))
+            with self.lock:
+                self.current[threading.get_ident()] = product
+            return product
+
+        def hand_over(self, thread_id=None):
+            with self.lock:
+                products = list(self.current.values()) if thread_id is None else [self.current.get(thread_id)]
+                for key in list(self.current) if thread_id is None else [thread_id]:
+                    self.current.pop(key, None)
+            for product in products:
+                if product is not None:
+                    product.seek(0)
+                    hand_over((product.filename, product.read()))
+
+    def extract():
+        try:
+            factory = PageFactory()
+            with py7zr.SevenZipFile(filepath, mode='r') as z:
+                z.extract(targets=list(names), factory=factory)
+            factory.hand_over()
+            hand_over(done)
+        except InterruptedError:
+            pass
+        except Exception as e:
+            try:
+                hand_over(e)
+            except InterruptedError:
+                pass
+
+    thread = threading.Thread(target=extract, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = pages.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+def _write_page(temp_dir, name, data):
+    root = os.path.realpath(temp_dir)
+    path = os.path.realpath(os.path.join(root, name))
+    if not path.startswith(root + os.sep):
+        raise ValueError(f"Arşiv dışına çıkan sayfa adı: {name}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+def extract_rar(filepath, temp_dir):
+    return get('rar').extract(filepath, temp_dir)
+
+def extract_7z(filepath, temp_dir):
+    return get('7z').extract(filepath, temp_dir)
+
+def list_epub_images(zf):
+    return [name for name in zf.namelist() if name.lower().endswith(core_logic.GECERLI_UZANTILAR)]
+
+def extract_epub(filepath, temp_dir):
+    image_map = {}
+    with zipfile.ZipFile(filepath, 'r') as zf:
+        for name in core_logic.sorted_alphanumeric(list_epub_images(zf)):
+            output_path = zf.extract(name, temp_dir)
+            image_map[output_path] = name
+    return image_map
+
+def _page_number(name):
+    match = re.search(r'page_(\d+)', os.path.basename(name))
+    return int(match.group(1)) if match else None
+
+def pdf_page_sizes(filepath):
+    import fitz
+    with fitz.open(filepath) as doc:
+        return [(page.rect.width, page.rect.height) for page in doc]
+
+class PdfWriter:
+    # Pages are embedded as DCTDecode streams, so anything but JPEG would be re-encoded on the way in.
+    image_formats = ('jpeg',)
+    COLORSPACES = {'L': b'/DeviceGray', 'RGB': b'/DeviceRGB', 'CMYK': b'/DeviceCMYK'}
+
+    def __init__(self, output_path, page_sizes=None):
+        self.output_path = output_path
+        self.temp_path = output_path + ".part"
+        self.page_sizes = page_sizes or []
+        self.f = open(self.temp_path, 'wb')
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = 3
+        self.f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write_object(self, obj_id, body, stream=None):
+        self.offsets[obj_id] = self.f.tell()
+        self.f.write(f"{obj_id} 0 obj\n".encode() + body)
+        if stream is not None:
+            self.f.write(b"\nstream\n")
+            self.f.write(stream)
+            self.f.write(b"\nendstream")
+        self.f.write(b"\nendobj\n")
+
+    def add_jpeg(self, data, page_size=None):
+        with Image.open(io.BytesIO(data)) as img:
+            width, height = img.size
+            colorspace = self.COLORSPACES.get(img.mode)
+        if colorspace is None:
+            raise ValueError(f"Desteklenmeyen JPEG renk modu: {img.mode}")
+        page_width, page_height = page_size or (width, height)
+        image_id, content_id, page_id = self.next_id, self.next_id + 1, self.next_id + 2
+        self.next_id += 3
+
+        decode = b" /Decode [1 0 1 0 1 0 1 0]" if colorspace == b'/DeviceCMYK' else b""
+        self._write_object(image_id, b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace %s /BitsPerComponent 8%s /Filter /DCTDecode /Length %d >>" % (width, height, colorspace, decode, len(data)), data)
+        content = f"q {page_width:.2f} 0 0 {page_height:.2f} 0 0 cm /Im0 Do Q".encode()
+        self._write_object(content_id, b"<< /Length %d >>" % len(content), content)
+        self._write_object(page_id, f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_width:.2f} {page_height:.2f}] /Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>".encode())
+        self.page_ids.append(page_id)
+
+    def add_image_file(self, path, page_size=None):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if not data.startswith(b"\xff\xd8"):
+            with Image.open(io.BytesIO(data)) as img:
+                data = core_logic._encode_jpeg(img if img.mode in ('RGB', 'L') else img.convert('RGB'), 95)
+        self.add_jpeg(data, page_size)
+
+    def add(self, name, translated_path):
+        if translated_path is None or not os.path.exists(translated_path):
+            return
+        page_number = _page_number(name)
+        page_size = self.page_sizes[page_number] if page_number is not None and page_number < len(self.page_sizes) else None
+        self.add_image_file(translated_path, page_size)
+
+    def close(self):
+        if not self.page_ids:
+            self.abort()
+            return False
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self._write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode())
+        self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref_offset = self.f.tell()
+        self.f.write(f"xref\n0 {self.next_id}\n0000000000 65535 f \n".encode())
+        for obj_id in range(1, self.next_id):
+            self.f.write(f"{self.offsets[obj_id]:010d} 00000 n \n".encode())
+        self.f.write(f"trailer\n<< /Size {self.next_id} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+        self.f.close()
+        os.replace(self.temp_path, self.output_path)
+        return True
+
+    def abort(self):
+        self.f.close()
+        if os.path.exists(self.temp_path): os.remove(self.temp_path)
+
+def repack_pdf(image_folder, output_path, source_pdf=None):
+    image_files = core_logic.sorted_alphanumeric([os.path.join(image_folder, f) for f in os.listdir(image_folder) if f.lower().endswith(SIKISTIRILMIS_UZANTILAR)])
+    writer = PdfWriter(output_path, pdf_page_sizes(source_pdf) if source_pdf else None)
+    try:
+        for path in image_files:
+            writer.add(path, path)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+
+def page_arcname(name, translated_path):
+    return os.path.join(os.path.dirname(name), os.path.basename(translated_path)).replace(os.sep, '/')
+
+class CbzWriter:
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.temp_path = output_path + ".part"
+        self.zf = zipfile.ZipFile(self.temp_path, 'w', zipfile.ZIP_DEFLATED)
+
+    def add(self, name, translated_path):
+        if translated_path is None or not os.path.exists(translated_path):
+            return
+        compress_type = zipfile.ZIP_STORED if translated_path.lower().endswith(SIKISTIRILMIS_UZANTILAR) else None
+        self.zf.write(translated_path, arcname=page_arcname(name, translated_path), compress_type=compress_type)
+
+    def close(self):
+        self.zf.close()
+        os.replace(self.temp_path, self.output_path)
+        return True
+
+    def abort(self):
+        self.zf.close()
+        if os.path.exists(self.temp_path): os.remove(self.temp_path)
+
+class Cb7Writer:
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.temp_path = output_path + ".part"
+        import py7zr
+        self.archive = py7zr.SevenZipFile(self.temp_path, 'w', filters=[{'id': py7zr.FILTER_COPY}])
+
+    def add(self, name, translated_path):
+        if translated_path is None or not os.path.exists(translated_path):
+            return
+        self.archive.write(translated_path, arcname=page_arcname(name, translated_path))
+
+    def close(self):
+        self.archive.close()
+        os.replace(self.temp_path, self.output_path)
+        return True
+
+    def abort(self):
+        self.archive.close()
+        if os.path.exists(self.temp_path): os.remove(self.temp_path)
+
+def _unique_output_path(path):
+    root, ext = os.path.splitext(path)
+    counter = 2
+    while os.path.exists(path) or os.path.exists(path + ".part"):
+        path = f"{root}_{counter}{ext}"
+        counter += 1
+    return path
+
+def repack_cbz(image_folder, output_path):
+    image_files = core_logic.sorted_alphanumeric([os.path.relpath(os.path.join(root, f), image_folder) for root, _, files in os.walk(image_folder) for f in files if f.lower().endswith(SIKISTIRILMIS_UZANTILAR)])
+    writer = Cb7Writer(output_path) if output_path.lower().endswith(('.cb7', '.7z')) else CbzWriter(output_path)
+    try:
+        for relative_path in image_files:
+            writer.add(relative_path, os.path.join(image_folder, relative_path))
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+
+def _epub_opf_path(zf):
+    try:
+        container = zf.read('META-INF/container.xml').decode('utf-8')
+    except KeyError:
+        return None
+    match = re.search(r'full-path\s*=\s*["\']([^"\']+)["\']', container)
+    return match.group(1) if match else None
+
+def _rewrite_epub_opf(content, opf_path, replaced, renames):
+    opf_dir = posixpath.dirname(opf_path)
+
+    def rewrite_item(match):
+        tag = match.group(0)
+        href_match = re.search(r'href\s*=\s*(["\'])([^"\']+)\1', tag)
+        if not href_match:
+            return tag
+        target = posixpath.normpath(posixpath.join(opf_dir, unquote(href_match.group(2))))
+        if target not in replaced:
+            return tag
+        ext = os.path.splitext(replaced[target])[1].lower()
+        tag = re.sub(r'media-type\s*=\s*(["\'])[^"\']*\1', f'media-type="{EPUB_MEDYA_TURLERI.get(ext, "image/jpeg")}"', tag)
+        if target in renames:
+            new_href = posixpath.splitext(href_match.group(2))[0] + posixpath.splitext(renames[target])[1]
+            tag = tag[:href_match.start(2)] + new_href + tag[href_match.end(2):]
+        return tag
+
+    return re.sub(r'<item\b[^>]*>', rewrite_item, content)
+
+def _rewrite_epub_references(content, member_name, renames):
+    member_dir = posixpath.dirname(member_name)
+    for old_name, new_name in renames.items():
+        if posixpath.basename(old_name) not in content:
+            continue
+        old_ref = posixpath.relpath(old_name, member_dir or '.')
+        new_ref = posixpath.relpath(new_name, member_dir or '.')
+        for old, new in ((old_ref, new_ref), (quote(old_ref), quote(new_ref))):
+            content = re.sub(r'(?<=["\'(=\s])' + re.escape(old) + r'(?=["\')#?\s])', new, content)
+    return content
+
+XML_KODLAMA = re.compile(rb'^\s*<\?xml[^>]*encoding\s*=\s*["\']([A-Za-z0-9._-]+)["\']')
+
+def _epub_text_encoding(data):
+    match = XML_KODLAMA.match(data[:256])
+    encoding = match.group(1).decode('ascii') if match else 'utf-8'
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        return 'utf-8'
+    return encoding
+
+def _strip_zip64_extra(extra):
+    kept, offset = b"", 0
+    while offset + 4 <= len(extra):
+        header_id, size = struct.unpack('<HH', extra[offset:offset + 4])
+        if header_id != 1:
+            kept += extra[offset:offset + 4 + size]
+        offset += 4 + size
+    return kept
+
+def _copy_raw_member(src_file, info, dst):
+    # The compressed bytes are moved as they are; only the local header is rebuilt (without a data descriptor).
+    src_file.seek(info.header_offset)
+    header = src_file.read(30)
+    if header[:4] != b"PK\x03\x04":
+        raise zipfile.BadZipFile(f"Bozuk yerel başlık: {info.filename}")
+    name_length, extra_length = struct.unpack('<HH', header[26:30])
+    src_file.seek(info.header_offset + 30 + name_length + extra_length)
+    new_info = copy.copy(info)
+    new_info.flag_bits &= ~0x08
+    new_info.extra = _strip_zip64_extra(info.extra)
+    new_info.header_offset = dst.fp.tell()
+    dst.fp.write(new_info.FileHeader())
+    remaining = info.compress_size
+    while remaining:
+        chunk = src_file.read(min(remaining, 1024 * 1024))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Eksik veri: {info.filename}")
+        dst.fp.write(chunk)
+        remaining -= len(chunk)
+    dst.filelist.append(new_info)
+    dst.NameToInfo[new_info.filename] = new_info
+    dst.start_dir = dst.fp.tell()
+
+class EpubWriter:
+    # The image types of the EPUB 3 core media types that the output encoder can write.
+    image_formats = ('jpeg', 'webp')
+    TEXT_UZANTILARI = ('.xhtml', '.html', '.htm', '.css', '.ncx', '.svg', '.smil', '.xml')
+
+    def __init__(self, source_path, output_path):
+        self.source_path = source_path
+        self.output_path = output_path
+        self.temp_path = output_path + ".part"
+        self.replacements = {}
+
+    def add(self, name, translated_path):
+        if translated_path is not None and os.path.exists(translated_path):
+            self.replacements[name] = translated_path
+
+    def close(self):
+        with zipfile.ZipFile(self.source_path, 'r') as src:
+            names = set(src.namelist())
+            renames = {}
+            for name, translated_path in self.replacements.items():
+                ext = os.path.splitext(translated_path)[1].lower()
+                new_name = posixpath.splitext(name)[0] + ext
+                same_type = EPUB_MEDYA_TURLERI.get(posixpath.splitext(name)[1].lower()) == EPUB_MEDYA_TURLERI.get(ext, 'image/jpeg')
+                if not same_type and new_name not in names and new_name not in renames.values():
+                    renames[name] = new_name
+            opf_path = _epub_opf_path(src)
+            infos = sorted(src.infolist(), key=lambda info: info.filename != 'mimetype')
+            with zipfile.ZipFile(self.temp_path, 'w', zipfile.ZIP_DEFLATED) as dst, open(self.source_path, 'rb') as src_file:
+                for info in infos:
+                    name = info.filename
+                    if name in self.replacements:
+                        new_info = zipfile.ZipInfo(renames.get(name, name), date_time=info.date_time)
+                        new_info.compress_type = zipfile.ZIP_STORED
+                        with open(self.replacements[name], 'rb') as f:
+                            dst.writestr(new_info, f.read())
+                    elif name == opf_path or (renames and name.lower().endswith(self.TEXT_UZANTILARI)):
+                        data = src.read(name)
+                        # Bytes that do not decode survive the round trip through surrogateescape unchanged.
+                        encoding = _epub_text_encoding(data)
+                        content = data.decode(encoding, errors='surrogateescape')
+                        if name == opf_path:
+                            content = _rewrite_epub_opf(content, opf_path, self.replacements, renames)
+                        content = _rewrite_epub_references(content, name, renames)
+                        dst.writestr(info, content.encode(encoding, errors='surrogateescape'))
+                    else:
+                        _copy_raw_member(src_file, info, dst)
+        os.replace(self.temp_path, self.output_path)
+        return True
+
+    def abort(self):
+        if os.path.exists(self.temp_path): os.remove(self.temp_path)
+
+def repack_epub(original_epub_path, translated_folder, image_map, output_path):
+    writer = EpubWriter(original_epub_path, output_path)
+    for epub_internal_name in image_map.values():
+        writer.add(epub_internal_name, output_encoder.resolve(core_logic.translated_output_path(epub_internal_name, translated_folder)))
+    writer.close()
+
+class ArchiveFormat:
+    name = None
+    extensions = ()
+    # Streaming formats list and read single pages from the source file; the rest are extracted to the work dir first.
+    streaming = False
+    can_repack = True
+    experimental = False
+
+    def list_pages(self, filepath, extract_dir):
+        return core_logic.sorted_alphanumeric(os.path.relpath(path, extract_dir) for path in core_logic.find_all_images(extract_dir))
+
+    def iter_pages(self, filepath, extract_dir, names):
+        for name in names:
+            with open(os.path.join(extract_dir, name), 'rb') as f:
+                yield name, f.read()
+
+    def extract(self, filepath, temp_dir):
+        raise NotImplementedError(f"{self.name} arşivleri çıkarılamıyor")
+
+    def signature_tasks(self, filepath, extract_dir, names):
+        return ((name, page_filter.signature_from_data, (data,)) for name, data in self.iter_pages(filepath, extract_dir, names))
+
+    def page_sizes(self, filepath, extract_dir, names):
+        return ((name, core_logic.image_size(data)) for name, data in self.iter_pages(filepath, extract_dir, names))
+
+    def release(self, filepath):
+        pass
+
+    def output_path(self, filepath, output_dir, timestamp, output_ext):
+        base_name = os.path.splitext(os.path.basename(filepath))[0]
+        return _unique_output_path(os.path.join(output_dir, f"{base_name}_output_{timestamp}{output_ext}"))
+
+    def create_writer(self, filepath, file_ext, output_dir, timestamp, keep_format=False):
+        output_filename = self.output_path(filepath, output_dir, timestamp, '.cbz')
+        return CbzWriter(output_filename), output_filename
+
+class ZipFormat(ArchiveFormat):
+    name = 'zip'
+    extensions = ('.cbz', '.zip')
+    streaming = True
+
+    def list_pages(self, filepath, extract_dir):
+        with zipfile.ZipFile(filepath, 'r') as zf:
+            return core_logic.sorted_alphanumeric(name for name in zf.namelist() if is_archive_image(name))
+
+    def iter_pages(self, filepath, extract_dir, names):
+        with zipfile.ZipFile(filepath, 'r') as zf:
+            for name in names:
+                yield name, zf.read(name)
+
+    def page_sizes(self, filepath, extract_dir, names):
+        # The image header sits at the start of the member, so the rest of the page is never inflated.
+        with zipfile.ZipFile(filepath, 'r') as zf:
+            for name in names:
+                with zf.open(name) as f:
+                    yield name, core_logic.image_size(f.read(64 * 1024))
+
+    def extract(self, filepath, temp_dir):
+        return extract_zip(filepath, temp_dir)
+
+    def create_writer(self, filepath, file_ext, output_dir, timestamp, keep_format=False):
+        output_filename = self.output_path(filepath, output_dir, timestamp, file_ext if keep_format and file_ext == '.zip' else '.cbz')
+        return CbzWriter(output_filename), output_filename
+
+class SinglePassFormat(ArchiveFormat):
+    # Pages come from one decompression pass in archive order and are kept in the work dir,
+    # so the page analysis and the translation that follows do not decompress the archive twice.
+    streaming = True
+
+    def iter_members(self, filepath, names):
+        raise NotImplementedError
+
+    def iter_pages(self, filepath, extract_dir, names):
+        missing = []
+        for name in names:
+            path = os.path.join(extract_dir, name)
+            if os.path.isfile(path):
+                with open(path, 'rb') as f:
+                    yield name, f.read()
+            else:
+                missing.append(name)
+        if missing:
+            for name, data in self.iter_members(filepath, missing):
+                _write_page(extract_dir, name, data)
+                yield name, data
+
+    def extract(self, filepath, temp_dir):
+        for _ in self.iter_pages(filepath, temp_dir, self.list_pages(filepath, temp_dir)):
+            pass
+
+class RarFormat(SinglePassFormat):
+    name = 'rar'
+    extensions = ('.cbr', '.rar')
+
+    def list_pages(self, filepath, extract_dir):
+        import rarfile
+        with rarfile.RarFile(filepath, 'r') as rf:
+            return core_logic.sorted_alphanumeric(info.filename for info in rf.infolist() if info.is_file() and is_archive_image(info.filename))
+
+    def iter_members(self, filepath, names):
+        return iter_rar_images(filepath, names)
+
+class SevenZipFormat(SinglePassFormat):
+    name = '7z'
+    extensions = ('.cb7', '.7z')
+
+    def list_pages(self, filepath, extract_dir):
+        import py7zr
+        with py7zr.SevenZipFile(filepath, mode='r') as z:
+            return core_logic.sorted_alphanumeric(info.filename for info in z.list() if not info.is_directory and is_archive_image(info.filename))
+
+    def iter_members(self, filepath, names):
+        return iter_7z_images(filepath, names)
+
+    def create_writer(self, filepath, file_ext, output_dir, timestamp, keep_format=False):
+        if not keep_format:
+            return super().create_writer(filepath, file_ext, output_dir, timestamp)
+        output_filename = self.output_path(filepath, output_dir, timestamp, file_ext)
+        return Cb7Writer(output_filename), output_filename
+
+class PdfFormat(ArchiveFormat):
+    name = 'pdf'
+    extensions = ('.pdf',)
+    streaming = True
+
+    def list_pages(self, filepath, extract_dir):
+        import fitz
+        with fitz.open(filepath) as doc:
+            return [f"page_{i:04d}.jpg" for i in range(doc.page_count)]
+
+    def iter_pages(self, filepath, extract_dir, names):
+        pool = core_logic.get_process_pool()
+        window = []
+        for name in names:
+            window.append((name, pool.submit(_render_pdf_page_worker, filepath, _page_number(name))))
+            if len(window) >= (os.cpu_count() or 1) * 2:
+                name, future = window.pop(0)
+                yield name, future.result()
+        for name, future in window:
+            yield name, future.result()
+
+    def extract(self, filepath, temp_dir):
+        return extract_pdf(filepath, temp_dir)
+
+    def signature_tasks(self, filepath, extract_dir, names):
+        return ((name, _pdf_page_signature_worker, (filepath, _page_number(name))) for name in names)
+
+    def page_sizes(self, filepath, extract_dir, names):
+        import fitz
+        with fitz.open(filepath) as doc:
+            for name in names:
+                rect = doc[_page_number(name)].rect
+                yield name, (rect.width, rect.height)
+
+    def release(self, filepath):
+        release_pdf(filepath)
+
+    def create_writer(self, filepath, file_ext, output_dir, timestamp, keep_format=False):
+        output_filename = self.output_path(filepath, output_dir, timestamp, '.pdf')
+        return PdfWriter(output_filename, pdf_page_sizes(filepath)), output_filename
+
+class EpubFormat(ZipFormat):
+    name = 'epub'
+    extensions = ('.epub',)
+    experimental = True
+
+    def list_pages(self, filepath, extract_dir):
+        with zipfile.ZipFile(filepath, 'r') as zf:
+            return core_logic.sorted_alphanumeric(list_epub_images(zf))
+
+    def extract(self, filepath, temp_dir):
+        return extract_epub(filepath, temp_dir)
+
+    def create_writer(self, filepath, file_ext, output_dir, timestamp, keep_format=False):
+        output_filename = self.output_path(filepath, output_dir, timestamp, '.epub')
+        return EpubWriter(filepath, output_filename), output_filename
+
+_formats = {}
+_by_extension = {}
+
+def register(handler):
+    _formats[handler.name] = handler
+    for ext in handler.extensions:
+        _by_extension[ext.lower()] = handler
+    return handler
+
+def get(name):
+    return _formats.get(name)
+
+def for_extension(file_ext):
+    return _by_extension.get(file_ext.lower())
+
+def for_path(path):
+    return for_extension(os.path.splitext(path)[1])
+
+def extensions():
+    return tuple(_by_extension)
+
+for _handler in (PdfFormat(), ZipFormat(), RarFormat(), SevenZipFormat(), EpubFormat()):
+    register(_handler)
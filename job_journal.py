@@ -0,0 +1,197 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+JOBS_DIR = ".jobs"
+BITEN_KLASORU = "done"
+BEKLIYOR = "pending"
+ONISLENDI = "preprocessed"
+CEVRILDI = "translated"
+BASARISIZ = "failed"
+
+def _fsync_dir(path):
+    if os.name != 'posix':
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _job_prefix(kind, source):
+    return f"{kind}_{hashlib.sha1(os.path.abspath(source).encode('utf-8')).hexdigest()[:10]}_"
+
+def _job_key(header):
+    return (header['kind'], header['source'], header['model'], header['target_lang'])
+
+_live = {}
+_live_lock = threading.Lock()
+
+class JobJournal:
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+        self.states = {}
+        self.extracted = None
+        self.status = "running"
+        self.valid_size = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def create(cls, kind, source, model, target_lang, output_folder, work_dir=None, jobs_dir=JOBS_DIR):
+        os.makedirs(jobs_dir, exist_ok=True)
+        job_id = f"{_job_prefix(kind, source)}{time.strftime('%Y%m%d_%H%M%S')}"
+        header = {
+            'job_id': job_id,
+            'kind': kind,
+            'source': os.path.abspath(source),
+            'model': model,
+            'target_lang': target_lang,
+            'output_folder': output_folder,
+            'work_dir': work_dir,
+            'created': time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        journal = cls(os.path.join(jobs_dir, f"{job_id}.jsonl"), header)
+        journal._append(dict(type='job', **header))
+        _fsync_dir(jobs_dir)
+        journal._register()
+        return journal
+
+    @classmethod
+    def load(cls, path):
+        # Read-only: a torn last line is skipped here and only cut off by repair(), once the caller owns the job.
+        records = []
+        good_offset = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"): raise ValueError("torn record")
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+                good_offset += len(line)
+        if not records or records[0].get('type') != 'job':
+            return None
+        journal = cls(path, {k: v for k, v in records[0].items() if k != 'type'})
+        journal.valid_size = good_offset
+        for record in records[1:]:
+            journal._apply(record)
+        return journal
+
+    def repair(self):
+        # Called by the job that resumes this journal, before its first append.
+        with self.lock:
+            if self.valid_size is not None and self.valid_size < os.path.getsize(self.path):
+                with open(self.path, 'r+b') as f:
+                    f.truncate(self.valid_size)
+                    os.fsync(f.fileno())
+            self.valid_size = None
+        self._register()
+
+    def _register(self):
+        with _live_lock:
+            _live[_job_key(self.header)] = self
+
+    def _unregister(self):
+        with _live_lock:
+            if _live.get(_job_key(self.header)) is self:
+                del _live[_job_key(self.header)]
+
+    def _apply(self, record):
+        record_type = record.get('type')
+        if record_type == 'image':
+            self.states[record['path']] = record['state']
+        elif record_type == 'images':
+            for path in record['paths']:
+                self.states.setdefault(path, BEKLIYOR)
+        elif record_type == 'extracted':
+            self.extracted = record
+        elif record_type == 'status':
+            self.status = record['status']
+
+    def _append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(record)
+
+    def add_images(self, paths):
+        new_paths = [path for path in paths if path not in self.states]
+        if new_paths:
+            self._append({'type': 'images', 'paths': new_paths})
+
+    def set_state(self, path, state):
+        self._append({'type': 'image', 'path': path, 'state': state})
+
+    def get_state(self, path):
+        return self.states.get(path, BEKLIYOR)
+
+    def count(self, state):
+        with self.lock:
+            return sum(1 for value in self.states.values() if value == state)
+
+    def progress(self):
+        with self.lock:
+            states = list(self.states.values())
+        return {'translated': states.count(CEVRILDI), 'failed': states.count(BASARISIZ), 'total': len(states)}
+
+    def mark_extracted(self, image_map=None):
+        self._append({'type': 'extracted', 'image_map': image_map})
+
+    def complete(self):
+        # A finished journal only matters to --redrive; without failed pages it is dropped, otherwise it moves to done/.
+        self._append({'type': 'status', 'status': 'done'})
+        self._unregister()
+        with self.lock:
+            if BASARISIZ not in self.states.values():
+                self.discard()
+                return
+            if os.path.basename(os.path.dirname(self.path)) == BITEN_KLASORU:
+                return
+            done_dir = os.path.join(os.path.dirname(self.path), BITEN_KLASORU)
+            os.makedirs(done_dir, exist_ok=True)
+            done_path = os.path.join(done_dir, os.path.basename(self.path))
+            os.replace(self.path, done_path)
+            self.path = done_path
+
+    def discard(self):
+        self._unregister()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+def load_job(job_id, jobs_dir=JOBS_DIR):
+    for path in (os.path.join(jobs_dir, f"{job_id}.jsonl"), os.path.join(jobs_dir, BITEN_KLASORU, f"{job_id}.jsonl")):
+        if os.path.exists(path):
+            return JobJournal.load(path)
+    return None
+
+def live_journal(kind, source, model, target_lang):
+    with _live_lock:
+        return _live.get((kind, os.path.abspath(source), model, target_lang))
+
+def find_incomplete(kind, source, model, target_lang, jobs_dir=JOBS_DIR):
+    if not os.path.isdir(jobs_dir):
+        return None
+    source = os.path.abspath(source)
+    # Job ids start with kind and a hash of the source, so only this source's journals are parsed.
+    prefix = _job_prefix(kind, source)
+    for filename in sorted(os.listdir(jobs_dir), reverse=True):
+        if not filename.startswith(prefix) or not filename.endswith(".jsonl"):
+            continue
+        try:
+            journal = JobJournal.load(os.path.join(jobs_dir, filename))
+        except OSError:
+            continue
+        if journal is None or journal.status != "running":
+            continue
+        header = journal.header
+        if header['source'] == source and header['model'] == model and header['target_lang'] == target_lang:
+            return journal
+    return None
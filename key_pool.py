@@ -0,0 +1,155 @@
+import os
+import time
+import threading
+import api_client
+
+YETKI_KODLARI = (401, 403)
+KOTA_KODLARI = (402,)
+AKTIF = "active"
+DEVRE_DISI = "disabled"
+BUTCE_BITTI = "budget_spent"
+
+class KeyPoolExhausted(Exception):
+    pass
+
+def mask_key(key):
+    return f"{key[:4]}...{key[-4:]}" if len(key) > 12 else f"...{key[-2:]}"
+
+def load_keys(profile):
+    entries, seen = [], set()
+    configured = [dict(entry) if isinstance(entry, dict) else {'key': entry} for entry in profile.get('api_keys', [])]
+    configured += [{'key': key.strip()} for key in os.getenv("API_KEYS", "").split(',') if key.strip()]
+    for entry in configured:
+        if entry.get('env'):
+            entry['key'] = os.getenv(entry['env'])
+        if entry.get('key') and entry['key'] not in seen:
+            seen.add(entry['key'])
+            entries.append(entry)
+    return entries
+
+def default_key(profile):
+    entries = load_keys(profile)
+    return entries[0]['key'] if entries else None
+
+class PooledKey:
+    def __init__(self, key, name=None, rate=None, max_concurrent=None, credit_budget=None):
+        self.key = key
+        self.name = name or mask_key(key)
+        self.limiter = api_client.RateLimiter(rate)
+        self.max_concurrent = int(max_concurrent) if max_concurrent else None
+        self.credit_budget = int(credit_budget) if credit_budget is not None else None
+        self.in_flight = 0
+        self.reserved = 0
+        self.credits = 0
+        self.requests = 0
+        self.ok = 0
+        self.failed = 0
+        self.seconds = 0.0
+        self.state = AKTIF
+        self.reason = None
+
+    def has_budget(self, cost):
+        return self.credit_budget is None or self.credits + self.reserved + cost <= self.credit_budget
+
+    def has_room(self):
+        return self.max_concurrent is None or self.in_flight < self.max_concurrent
+
+    def load(self, default_concurrency):
+        return self.in_flight / (self.max_concurrent or default_concurrency)
+
+class KeyPool:
+    def __init__(self, entries, default_rate=None, default_concurrency=None, costs=None, lang=None):
+        self.keys = [PooledKey(entry['key'], entry.get('name'), entry.get('requests_per_second') or default_rate, entry.get('max_concurrent'), entry.get('credit_budget')) for entry in entries]
+        self.default_concurrency = max(1, int(default_concurrency or 1))
+        self.costs = costs or {}
+        self.lang = lang or {}
+        self.condition = threading.Condition()
+
+    def cost_of(self, model):
+        cost = (self.costs.get(model) or "0").replace('+', '')
+        return int(cost) if cost.isdigit() else 0
+
+    def acquire(self, cost):
+        with self.condition:
+            while True:
+                usable = [key for key in self.keys if key.state == AKTIF and key.has_budget(cost)]
+                if not usable:
+                    return None
+                free = [key for key in usable if key.has_room()]
+                if free:
+                    key = min(free, key=lambda key: (key.load(self.default_concurrency), -(key.limiter.rate or float('inf')), key.requests))
+                    key.in_flight += 1
+                    key.reserved += cost
+                    key.requests += 1
+                    return key
+                self.condition.wait()
+
+    def release(self, key, cost, success, seconds):
+        with self.condition:
+            key.in_flight -= 1
+            key.reserved -= cost
+            key.seconds += seconds
+            if success:
+                key.ok += 1
+                key.credits += cost
+            else:
+                key.failed += 1
+            if key.state == AKTIF and key.credit_budget is not None and key.credits >= key.credit_budget:
+                key.state = BUTCE_BITTI
+            self.condition.notify_all()
+
+    def disable(self, key, reason):
+        with self.condition:
+            if key.state != AKTIF:
+                return
+            key.state, key.reason = DEVRE_DISI, reason
+            self.condition.notify_all()
+        print(self.lang.get('WARN_KEY_DISABLED', '...').format(name=key.name, reason=reason))
+
+    def post(self, url, headers, filename, data, mime_type, timeout=None, image=None, cancel=None):
+        cost = self.cost_of(headers.get('translator'))
+        response, attempts = None, 0
+        while True:
+            key = self.acquire(cost)
+            if key is None:
+                if response is not None:
+                    return response, attempts
+                raise KeyPoolExhausted("Kullanılabilir API anahtarı kalmadı (yetki, kota veya kredi bütçesi)")
+            started = time.perf_counter()
+            success = False
+            try:
+                response, attempts = api_client.post_image(url, {**headers, "Authorization": f"Bearer {key.key}"}, filename, data, mime_type, timeout=timeout, image=image, limiter=key.limiter, cancel=cancel)
+                success = response.headers.get("success") == "true"
+            finally:
+                self.release(key, cost, success, time.perf_counter() - started)
+            # An auth or quota answer says nothing about the page; it is sent again on another key.
+            if response.status_code in YETKI_KODLARI + KOTA_KODLARI:
+                self.disable(key, f"HTTP {response.status_code}")
+                continue
+            return response, attempts
+
+    def report(self):
+        with self.condition:
+            return [{
+                'name': key.name,
+                'state': key.state,
+                'reason': key.reason or "",
+                'requests': key.requests,
+                'ok': key.ok,
+                'failed': key.failed,
+                'credits': key.credits,
+                'budget': key.credit_budget if key.credit_budget is not None else "-",
+                'latency': key.seconds / key.requests if key.requests else 0.0,
+            } for key in self.keys]
+
+_pool = None
+_state_lock = threading.Lock()
+
+def configure(entries, default_rate=None, default_concurrency=None, costs=None, lang=None):
+    global _pool
+    with _state_lock:
+        _pool = KeyPool(entries, default_rate, default_concurrency, costs, lang) if entries else None
+        return _pool
+
+def get_pool():
+    return _pool
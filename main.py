@@ -2,6 +2,7 @@ import os
 import sys
 import configparser
 import json
+import argparse
 
 def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
@@ -35,7 +36,53 @@ def load_language_strings(lang_file_path):
     config.read(lang_file_path, encoding='utf-8')
     return config['strings']
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Translation Automation Tool")
+    parser.add_argument('paths', nargs='*', help="Archives or folders to translate without the interactive menu")
+    parser.add_argument('--manifest', help="JSON job manifest (list of paths or {\"jobs\": [...]})")
+    parser.add_argument('--model', help="Translation model (defaults to profile.json)")
+    parser.add_argument('--target-lang', help="Target language (defaults to profile.json)")
+    parser.add_argument('--api-key', help="API key (defaults to api.env / API_KEY)")
+    parser.add_argument('--workers', type=int, help="Shared upload pool size")
+    parser.add_argument('--jobs', type=int, help="Number of archives/folders prepared and repacked in parallel")
+    parser.add_argument('--output-dir', help="Folder for translated archives and single images")
+    parser.add_argument('--report', help="Path of the JSON summary report")
+    parser.add_argument('--changed-only', action='store_true', help="Only translate archives and folders that are new or changed since their last translation")
+    parser.add_argument('--redrive', nargs='?', const='latest', metavar='FAILURES', help="Re-submit the retryable failures recorded in a failure manifest (defaults to the latest one in .failures)")
+    parser.add_argument('--daemon', action='store_true', help="Run as a local job server that keeps connections and the rate limit shared between clients")
+    parser.add_argument('--port', type=int, help="Daemon HTTP port on 127.0.0.1 (default 8766)")
+    parser.add_argument('--socket', help="Serve the daemon on this Unix socket instead of a TCP port")
+    parser.add_argument('--watch', metavar='FOLDER', help="Watch a folder and translate new images and archives as soon as they are fully written")
+    parser.add_argument('--poll', action='store_true', help="Watch by polling instead of inotify (e.g. for network shares)")
+    parser.add_argument('--lang', help="Interface language file (e.g. lang/en.ini)")
+    return parser.parse_args(argv)
+
+def load_profile(profile_path='profile.json'):
+    if os.path.exists(profile_path):
+        with open(profile_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+def run_batch(args):
+    profile = load_profile()
+    lang_file = args.lang or profile.get('language_file') or os.path.join("lang", "en.ini")
+    lang = load_language_strings(lang_file)
+    if args.daemon:
+        import daemon_mode
+        return daemon_mode.start_daemon(args, lang, profile)
+    if args.watch:
+        import watch_mode
+        return watch_mode.start_watch(args, lang, profile)
+    import batch_mode
+    if args.redrive:
+        return batch_mode.start_redrive(args, lang, profile)
+    return batch_mode.start_batch(args, lang, profile)
+
 def main():
+    args = parse_args()
+    if args.paths or args.manifest or args.redrive or args.daemon or args.watch:
+        sys.exit(run_batch(args))
+
     clear_screen()
     profile_path = 'profile.json'
     profile = None
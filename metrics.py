@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import bisect
+import threading
+from collections import deque
+
+METRICS_DIR = ".metrics"
+PROM_DOSYASI = "translator.prom"
+PROM_YAZMA_ARALIGI_SN = 5.0
+HIZ_PENCERESI = 50
+SURE_KOVALARI = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+SAYACLAR = ('images_translated', 'images_failed', 'bytes_source', 'bytes_uploaded', 'bytes_downloaded', 'requests', 'retries', 'throttled', 'cache_hits', 'cache_misses', 'pages_skipped', 'tiles_uploaded', 'timeouts', 'hedged', 'hedge_wins')
+
+class _Timer:
+    __slots__ = ('metrics', 'stage', 'image', 'started')
+
+    def __init__(self, metrics, stage, image):
+        self.metrics = metrics
+        self.stage = stage
+        self.image = image
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.stage, time.perf_counter() - self.started, self.image)
+        return False
+
+class Metrics:
+    def __init__(self, metrics_dir=None):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.stages = {}
+        self.counters = dict.fromkeys(SAYACLAR, 0)
+        self.images = {}
+        self.expected = 0
+        self.done = 0
+        self.recent = deque(maxlen=HIZ_PENCERESI)
+        self.jsonl = None
+        self.jsonl_path = None
+        self.prom_path = None
+        self.prom_written = 0.0
+        if metrics_dir:
+            os.makedirs(metrics_dir, exist_ok=True)
+            self.jsonl_path = os.path.join(metrics_dir, f"run_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.jsonl")
+            self.prom_path = os.path.join(metrics_dir, PROM_DOSYASI)
+            self.jsonl = open(self.jsonl_path, 'a', encoding='utf-8', buffering=1 << 16)
+
+    def timer(self, stage, image=None):
+        return _Timer(self, stage, image)
+
+    def observe(self, stage, seconds, image=None):
+        with self.lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = [0, 0.0, [0] * len(SURE_KOVALARI)]
+            histogram[0] += 1
+            histogram[1] += seconds
+            bucket = bisect.bisect_left(SURE_KOVALARI, seconds)
+            if bucket < len(SURE_KOVALARI):
+                histogram[2][bucket] += 1
+            if image is not None:
+                timings = self.images.setdefault(image, {})
+                timings[stage] = timings.get(stage, 0.0) + seconds
+
+    def add(self, counter, amount=1):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def expect(self, count):
+        with self.lock:
+            self.expected += count
+
+    def finish_image(self, image, success, **fields):
+        now = time.time()
+        with self.lock:
+            timings = self.images.pop(image, {})
+            self.done += 1
+            self.recent.append(time.monotonic())
+            self.counters['images_translated' if success else 'images_failed'] += 1
+            if self.jsonl is not None:
+                record = {'type': 'image', 'ts': round(now, 3), 'image': image, 'ok': success, 'stages': {k: round(v, 4) for k, v in timings.items()}}
+                record.update(fields)
+                self.jsonl.write(json.dumps(record, ensure_ascii=False) + "\n")
+            write_prom = self.prom_path is not None and now - self.prom_written >= PROM_YAZMA_ARALIGI_SN
+        if write_prom:
+            self.write_prometheus()
+
+    def rate(self):
+        with self.lock:
+            if len(self.recent) >= 2 and self.recent[-1] > self.recent[0]:
+                return (len(self.recent) - 1) / (self.recent[-1] - self.recent[0])
+            elapsed = time.time() - self.started
+            return self.done / elapsed if elapsed > 0 else 0.0
+
+    def progress_line(self, lang):
+        rate = self.rate()
+        with self.lock:
+            remaining = max(0, self.expected - self.done)
+        eta = time.strftime('%H:%M:%S', time.gmtime(remaining / rate)) if rate > 0 else "--:--:--"
+        return lang.get('INFO_PROGRESS', '({rate:.2f} img/s, ETA {eta})').format(rate=rate, eta=eta, remaining=remaining)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'started': self.started,
+                'seconds': time.time() - self.started,
+                'expected': self.expected,
+                'done': self.done,
+                'counters': dict(self.counters),
+                'stages': {stage: {'count': h[0], 'seconds': h[1]} for stage, h in self.stages.items()},
+                'histograms': {stage: (h[0], h[1], list(h[2])) for stage, h in self.stages.items()},
+            }
+
+    def write_prometheus(self):
+        if self.prom_path is None:
+            return
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP translator_stage_seconds Time spent in each pipeline stage.",
+            "# TYPE translator_stage_seconds histogram",
+        ]
+        for stage, (count, total, buckets) in sorted(snapshot['histograms'].items()):
+            cumulative = 0
+            for bound, bucket_count in zip(SURE_KOVALARI, buckets):
+                cumulative += bucket_count
+                lines.append(f'translator_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'translator_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'translator_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'translator_stage_seconds_count{{stage="{stage}"}} {count}')
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f"# TYPE translator_{name}_total counter")
+            lines.append(f"translator_{name}_total {value}")
+        lines.append("# TYPE translator_images_expected gauge")
+        lines.append(f"translator_images_expected {snapshot['expected']}")
+        lines.append("# TYPE translator_run_started_timestamp_seconds gauge")
+        lines.append(f"translator_run_started_timestamp_seconds {snapshot['started']:.3f}")
+        temp_path = f"{self.prom_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, self.prom_path)
+        with self.lock:
+            self.prom_written = time.time()
+
+    def close(self):
+        self.write_prometheus()
+        with self.lock:
+            if self.jsonl is not None:
+                summary = {'type': 'summary', 'ts': round(time.time(), 3), 'seconds': round(time.time() - self.started, 3), 'images': self.done, 'counters': self.counters, 'stages': {stage: {'count': h[0], 'seconds': round(h[1], 4)} for stage, h in self.stages.items()}}
+                self.jsonl.write(json.dumps(summary) + "\n")
+                self.jsonl.close()
+                self.jsonl = None
+
+_metrics = Metrics()
+_state_lock = threading.Lock()
+
+def configure(enabled=True, metrics_dir=METRICS_DIR):
+    global _metrics
+    with _state_lock:
+        _metrics = Metrics(metrics_dir if enabled else None)
+        return _metrics
+
+def get_metrics():
+    return _metrics
@@ -0,0 +1,194 @@
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+VARSAYILAN_PORT = 8765
+PARCA_BOYUTU = 64 * 1024
+
+class MockConfig:
+    def __init__(self, latency_ms=300.0, jitter_ms=100.0, distribution='lognormal', error_rate=0.0, burst_every=0, burst_length=0, retry_after=1.0, bandwidth_kbps=0.0, seed=None, reject_keys=(), stall_rate=0.0, stall_ms=30000.0):
+        self.latency_ms = float(latency_ms)
+        self.jitter_ms = float(jitter_ms)
+        self.distribution = distribution
+        self.error_rate = float(error_rate)
+        self.burst_every = int(burst_every)
+        self.burst_length = int(burst_length)
+        self.retry_after = retry_after
+        self.bandwidth_kbps = float(bandwidth_kbps)
+        self.reject_keys = set(reject_keys or ())
+        self.stall_rate = float(stall_rate)
+        self.stall_ms = float(stall_ms)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.stats = {'requests': 0, 'ok': 0, 'errors': 0, 'throttled': 0, 'bytes_in': 0, 'bytes_out': 0, 'rejected': 0, 'stalled': 0, 'keys': {}}
+
+    def latency(self):
+        with self.lock:
+            if self.distribution == 'fixed' or self.jitter_ms <= 0:
+                value = self.latency_ms
+            elif self.distribution == 'uniform':
+                value = self.random.uniform(self.latency_ms - self.jitter_ms, self.latency_ms + self.jitter_ms)
+            else:
+                sigma = (self.jitter_ms / self.latency_ms) if self.latency_ms > 0 else 0.0
+                value = self.latency_ms * self.random.lognormvariate(-sigma * sigma / 2, sigma)
+            if self.stall_rate and self.random.random() < self.stall_rate:
+                self.stats['stalled'] += 1
+                value = self.stall_ms
+        return max(0.0, value) / 1000.0
+
+    def next_outcome(self):
+        with self.lock:
+            self.requests += 1
+            self.stats['requests'] += 1
+            if self.burst_every and self.burst_length and (self.requests - 1) % self.burst_every >= self.burst_every - self.burst_length:
+                self.stats['throttled'] += 1
+                return 'throttled'
+            if self.error_rate and self.random.random() < self.error_rate:
+                self.stats['errors'] += 1
+                return 'error'
+            self.stats['ok'] += 1
+            return 'ok'
+
+    def check_key(self, authorization):
+        key = (authorization or "").replace("Bearer ", "", 1)
+        with self.lock:
+            self.stats['keys'][key] = self.stats['keys'].get(key, 0) + 1
+            if key in self.reject_keys:
+                self.stats['rejected'] += 1
+                return False
+            return True
+
+    def count(self, key, amount):
+        with self.lock:
+            self.stats[key] += amount
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _throttle(self, size, started):
+        bandwidth = self.server.config.bandwidth_kbps
+        if bandwidth > 0:
+            remaining = started + size / (bandwidth * 1024) - time.monotonic()
+            if remaining > 0: time.sleep(remaining)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        started = time.monotonic()
+        chunks = []
+        received = 0
+        while received < length:
+            chunk = self.rfile.read(min(PARCA_BOYUTU, length - received))
+            if not chunk: break
+            chunks.append(chunk)
+            received += len(chunk)
+            self._throttle(received, started)
+        self.server.config.count('bytes_in', received)
+        return b"".join(chunks)
+
+    def _send(self, status, body, headers):
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        started = time.monotonic()
+        for offset in range(0, len(body), PARCA_BOYUTU):
+            self.wfile.write(body[offset:offset + PARCA_BOYUTU])
+            self._throttle(offset + PARCA_BOYUTU, started)
+        self.server.config.count('bytes_out', len(body))
+
+    def _extract_file(self, body):
+        content_type = self.headers.get('Content-Type', '')
+        if 'boundary=' not in content_type:
+            return None, None
+        boundary = b"--" + content_type.split('boundary=', 1)[1].strip().strip('"').encode('latin-1')
+        for part in body.split(boundary):
+            head, _, content = part.partition(b"\r\n\r\n")
+            if b'name="file"' in head:
+                mime_type = None
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-type:"):
+                        mime_type = line.split(b":", 1)[1].strip().decode('latin-1')
+                return content[:-2] if content.endswith(b"\r\n") else content, mime_type
+        return None, None
+
+    def do_POST(self):
+        config = self.server.config
+        body = self._read_body()
+        if self.path.split('?', 1)[0] != '/api/upload':
+            self._send(404, b'{"error": "not found"}', {'Content-Type': 'application/json', 'success': 'false'})
+            return
+        if not config.check_key(self.headers.get('Authorization')):
+            self._send(401, b'{"error": "Invalid API key"}', {'Content-Type': 'application/json', 'success': 'false'})
+            return
+        outcome = config.next_outcome()
+        time.sleep(config.latency())
+        if outcome == 'throttled':
+            self._send(429, b'{"error": "Too many requests"}', {'Content-Type': 'application/json', 'success': 'false', 'Retry-After': str(config.retry_after)})
+            return
+        image_data, mime_type = self._extract_file(body)
+        if outcome == 'error' or not image_data:
+            message = "Simulated server error" if outcome == 'error' else "No file uploaded"
+            self._send(500 if outcome == 'error' else 400, json.dumps({'error': message}).encode('utf-8'), {'Content-Type': 'application/json', 'success': 'false'})
+            return
+        self._send(200, image_data, {'Content-Type': mime_type or 'image/jpeg', 'success': 'true'})
+
+    def log_message(self, format, *args):
+        pass
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host, port, config):
+        super().__init__((host, port), MockHandler)
+        self.config = config
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/api/upload"
+
+def start(host="127.0.0.1", port=0, **options):
+    server = MockServer(host, port, MockConfig(**options))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the /api/upload translation endpoint")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=VARSAYILAN_PORT)
+    parser.add_argument('--latency-ms', type=float, default=300.0, help="Mean processing time per image")
+    parser.add_argument('--jitter-ms', type=float, default=100.0, help="Spread of the latency distribution")
+    parser.add_argument('--distribution', choices=('fixed', 'uniform', 'lognormal'), default='lognormal')
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    parser.add_argument('--burst-every', type=int, default=0, help="Throttle window length in requests")
+    parser.add_argument('--burst-length', type=int, default=0, help="Requests answered with 429 at the end of each window")
+    parser.add_argument('--retry-after', default="1", help="Retry-After header sent with 429 responses")
+    parser.add_argument('--bandwidth-kbps', type=float, default=0.0, help="Per-connection bandwidth cap in KiB/s (0 = unlimited)")
+    parser.add_argument('--reject-keys', default="", help="Comma separated API keys answered with HTTP 401")
+    parser.add_argument('--stall-rate', type=float, default=0.0, help="Fraction of requests that hang for --stall-ms before answering")
+    parser.add_argument('--stall-ms', type=float, default=30000.0)
+    parser.add_argument('--seed', type=int)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = MockConfig(args.latency_ms, args.jitter_ms, args.distribution, args.error_rate, args.burst_every, args.burst_length, args.retry_after, args.bandwidth_kbps, args.seed, [key for key in args.reject_keys.split(',') if key], args.stall_rate, args.stall_ms)
+    server = MockServer(args.host, args.port, config)
+    print(f"Mock translation server listening on {server.url}")
+    print(f"Point the tool at it with: TORII_API_URL={server.url} python3 main.py")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(config.stats))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
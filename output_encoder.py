@@ -0,0 +1,220 @@
+import io
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+import metrics
+
+VARSAYILAN_FORMAT = "jpeg"
+VARSAYILAN_KALITE = {'jpeg': 85, 'webp': 80, 'avif': 60}
+FORMAT_UZANTILARI = {'jpeg': '.jpg', 'webp': '.webp', 'avif': '.avif'}
+MIN_KAZANC_ORANI = 0.05
+GRI_TOLERANSI = 6
+GRI_ORNEK_BOYUTU = (256, 256)
+
+def format_available(name):
+    if name == 'avif':
+        try:
+            # Older Pillow releases only write AVIF through the pillow-avif-plugin package.
+            import pillow_avif
+        except ImportError:
+            pass
+    Image.init()
+    return name.upper() in Image.SAVE
+
+def output_candidates(path):
+    root = os.path.splitext(path)[0]
+    return [path] + [root + ext for ext in FORMAT_UZANTILARI.values() if root + ext != path]
+
+def existing_output(path):
+    for candidate in output_candidates(path):
+        if os.path.exists(candidate):
+            return candidate
+    return path
+
+def remove_alternates(path):
+    for candidate in output_candidates(path)[1:]:
+        if os.path.exists(candidate): os.remove(candidate)
+
+def _is_grayscale(img):
+    # Manga pages come back from the API as RGB; when the chroma never leaves neutral, one channel is enough.
+    probe = img.copy()
+    probe.thumbnail(GRI_ORNEK_BOYUTU)
+    _, cb, cr = probe.convert('YCbCr').split()
+    return all(128 - GRI_TOLERANSI <= low and high <= 128 + GRI_TOLERANSI for low, high in (cb.getextrema(), cr.getextrema()))
+
+def _prepare(img, fmt, grayscale):
+    has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+    if has_alpha and fmt != 'jpeg':
+        return img.convert('RGBA')
+    if has_alpha:
+        rgba = img.convert('RGBA')
+        img = Image.new('RGB', img.size, 'white')
+        img.paste(rgba, mask=rgba.getchannel('A'))
+    elif img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    if grayscale and img.mode == 'RGB' and _is_grayscale(img):
+        img = img.convert('L')
+    return img
+
+def _encode(img, fmt, quality, icc_profile):
+    buffer = io.BytesIO()
+    # Only the colour profile is carried over; EXIF, XMP and comments are dropped.
+    options = {'icc_profile': icc_profile} if icc_profile else {}
+    if fmt == 'jpeg':
+        img.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True, **options)
+    elif fmt == 'webp':
+        img.save(buffer, 'WEBP', quality=quality, method=4, **options)
+    else:
+        format_available('avif')
+        if img.mode == 'L':
+            img = img.convert('RGB')
+        img.save(buffer, 'AVIF', quality=quality, speed=6, **options)
+    return buffer.getvalue()
+
+def _transcode_worker(path, fmt, quality, max_width, max_height, min_saving, grayscale):
+    started = time.perf_counter()
+    with open(path, 'rb') as f:
+        data = f.read()
+    with Image.open(io.BytesIO(data)) as img:
+        icc_profile = img.info.get('icc_profile')
+        resized = bool(max_width and img.width > max_width) or bool(max_height and img.height > max_height)
+        if resized:
+            if img.format == 'JPEG':
+                img.draft(img.mode, (max_width or img.width, max_height or img.height))
+            img.thumbnail((max_width or img.width, max_height or img.height), Image.Resampling.LANCZOS)
+        prepared = _prepare(img, fmt, grayscale)
+        if prepared.mode != img.mode:
+            icc_profile = None
+        encoded = _encode(prepared, fmt, quality, icc_profile)
+    # A capped page is always rewritten; otherwise the new encoding has to pay for itself.
+    if not resized and len(encoded) > len(data) * (1 - min_saving):
+        remove_alternates(path)
+        return path, len(data), len(data), time.perf_counter() - started, False
+    output_path = os.path.splitext(path)[0] + FORMAT_UZANTILARI[fmt]
+    temp_path = output_path + ".part"
+    with open(temp_path, 'wb') as f: f.write(encoded)
+    os.replace(temp_path, output_path)
+    remove_alternates(output_path)
+    return output_path, len(data), len(encoded), time.perf_counter() - started, True
+
+class OutputEncoder:
+    def __init__(self, fmt=VARSAYILAN_FORMAT, quality=None, max_width=0, max_height=0, min_saving=MIN_KAZANC_ORANI, grayscale=True, workers=None):
+        self.format = fmt
+        self.quality = int(quality or VARSAYILAN_KALITE[fmt])
+        self.max_width = int(max_width or 0)
+        self.max_height = int(max_height or 0)
+        self.min_saving = float(min_saving)
+        self.grayscale = bool(grayscale)
+        # Kept apart from the upload encoder's pool, so re-encoding finished pages never queues ahead of an upload.
+        self.workers = max(1, int(workers or (os.cpu_count() or 2) // 2))
+        self.pool = None
+        self.pending = {}
+        self.pinned = {}
+        self.totals = {'pages': 0, 'kept': 0, 'failed': 0, 'before': 0, 'after': 0}
+        self.lock = threading.Lock()
+
+    def _get_pool(self):
+        with self.lock:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+            return self.pool
+
+    def pin_format(self, folder, allowed):
+        # Containers that cannot embed the configured format (PDF, EPUB) get JPEG pages instead.
+        if allowed and self.format not in allowed:
+            with self.lock:
+                self.pinned[os.path.join(os.path.abspath(folder), '')] = 'jpeg'
+
+    def unpin_format(self, folder):
+        with self.lock:
+            self.pinned.pop(os.path.join(os.path.abspath(folder), ''), None)
+
+    def format_for(self, path):
+        path = os.path.abspath(path)
+        with self.lock:
+            for folder, fmt in self.pinned.items():
+                if path.startswith(folder):
+                    return fmt
+        return self.format
+
+    def write(self, content, output_path):
+        # A page rewritten while its previous version is still being encoded waits for it, so the two never race on disk.
+        self.resolve(output_path)
+        with open(output_path, "wb") as f_out: f_out.write(content)
+        fmt = self.format_for(output_path)
+        quality = self.quality if fmt == self.format else VARSAYILAN_KALITE[fmt]
+        pool = self._get_pool()
+        with self.lock:
+            future = self.pending[output_path] = pool.submit(_transcode_worker, output_path, fmt, quality, self.max_width, self.max_height, self.min_saving, self.grayscale)
+        future.add_done_callback(lambda done: self._finished(output_path, done))
+        return output_path
+
+    def _finished(self, path, future):
+        with self.lock:
+            if self.pending.get(path) is future:
+                del self.pending[path]
+            if future.cancelled() or future.exception() is not None:
+                self.totals['failed'] += 1
+                return
+            _, before, after, seconds, rewritten = future.result()
+            self.totals['pages'] += 1
+            self.totals['kept'] += 0 if rewritten else 1
+            self.totals['before'] += before
+            self.totals['after'] += after
+        metrics.get_metrics().observe('transcode', seconds)
+
+    def resolve(self, path):
+        with self.lock:
+            future = self.pending.get(path)
+        if future is not None:
+            try:
+                return future.result()[0]
+            except Exception:
+                pass
+        return existing_output(path)
+
+    def close(self):
+        with self.lock:
+            futures = list(self.pending.values())
+        for future in futures:
+            try:
+                future.result()
+            except Exception:
+                pass
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+
+    def report(self):
+        with self.lock:
+            totals = dict(self.totals)
+        return dict(totals, format=self.format, before_mb=totals['before'] / (1024 * 1024), after_mb=totals['after'] / (1024 * 1024), saved_mb=(totals['before'] - totals['after']) / (1024 * 1024))
+
+_encoder = None
+_state_lock = threading.Lock()
+
+def configure(enabled, fmt=VARSAYILAN_FORMAT, quality=None, max_width=0, max_height=0, min_saving=MIN_KAZANC_ORANI, grayscale=True, workers=None):
+    global _encoder
+    with _state_lock:
+        if _encoder is not None:
+            _encoder.close()
+        _encoder = OutputEncoder(fmt, quality, max_width, max_height, min_saving, grayscale, workers) if enabled else None
+        return _encoder
+
+def get_encoder():
+    return _encoder
+
+def resolve(path):
+    encoder = _encoder
+    return encoder.resolve(path) if encoder is not None else existing_output(path)
+
+def pin_format(folder, allowed):
+    if _encoder is not None:
+        _encoder.pin_format(folder, allowed)
+
+def unpin_format(folder):
+    if _encoder is not None:
+        _encoder.unpin_format(folder)
@@ -0,0 +1,74 @@
+import io
+import hashlib
+from PIL import Image, ImageStat
+
+BOS_ORNEK_GENISLIGI = 768
+BOS_KARO_SAYISI = 8
+BOS_SAYFA_STD = 2.5
+BOS_SAYFA_TOLERANSI = 12
+BOS_SAYFA_ORANI = 0.998
+
+BOS = "blank"
+KOPYA = "duplicate"
+
+def _is_blank_tile(tile):
+    if ImageStat.Stat(tile).stddev[0] < BOS_SAYFA_STD:
+        return True
+    histogram = tile.histogram()
+    peak = max(range(256), key=histogram.__getitem__)
+    near_peak = sum(histogram[max(0, peak - BOS_SAYFA_TOLERANSI):peak + BOS_SAYFA_TOLERANSI + 1])
+    return near_peak >= BOS_SAYFA_ORANI * tile.width * tile.height
+
+def _is_blank(gray):
+    # A single line of text is a rounding error against the whole page, so every tile has to look empty on its own.
+    columns, rows = min(BOS_KARO_SAYISI, gray.width), min(BOS_KARO_SAYISI, gray.height)
+    for row in range(rows):
+        for column in range(columns):
+            box = (column * gray.width // columns, row * gray.height // rows, (column + 1) * gray.width // columns, (row + 1) * gray.height // rows)
+            if not _is_blank_tile(gray.crop(box)):
+                return False
+    return True
+
+def _scaled(gray, width):
+    if gray.width <= width:
+        return gray
+    return gray.resize((width, max(1, round(gray.height * width / gray.width))), Image.Resampling.BILINEAR)
+
+def signature_from_image(img):
+    width, height = img.size
+    probe = _scaled(img.convert('L'), BOS_ORNEK_GENISLIGI)
+    # Reusing a translation is only safe for the very same pixels; two pages with the same art and different dialogue
+    # look alike to any perceptual hash, so duplicates have to match exactly.
+    digest = hashlib.sha256(f"{width}x{height}".encode() + probe.tobytes()).hexdigest()
+    return {'blank': _is_blank(probe), 'digest': digest}
+
+def signature_from_data(image_data):
+    with Image.open(io.BytesIO(image_data)) as img:
+        img.draft('L', (BOS_ORNEK_GENISLIGI, BOS_ORNEK_GENISLIGI))
+        return signature_from_image(img)
+
+def signature_from_file(path):
+    with Image.open(path) as img:
+        img.draft('L', (BOS_ORNEK_GENISLIGI, BOS_ORNEK_GENISLIGI))
+        return signature_from_image(img)
+
+def plan_pages(names, signatures, skip_blank=True, skip_duplicates=True):
+    plan = {}
+    representatives = {}
+    for name in names:
+        signature = signatures.get(name)
+        if signature is None:
+            continue
+        if skip_blank and signature['blank']:
+            plan[name] = (BOS, None)
+            continue
+        if not skip_duplicates:
+            continue
+        match = representatives.setdefault(signature['digest'], name)
+        if match != name:
+            plan[name] = (KOPYA, match)
+    return plan
+
+def count_skipped(plan):
+    blank = sum(1 for kind, _ in plan.values() if kind == BOS)
+    return blank, len(plan) - blank
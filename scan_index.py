@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import atexit
+import hashlib
+import threading
+
+INDEX_PATH = os.path.join(".scan_index", "index.json")
+INDEX_SURUMU = 1
+OKUMA_PARCASI = 1024 * 1024
+KAYDETME_ARALIGI_SN = 5.0
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(OKUMA_PARCASI), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ScanIndex:
+    def __init__(self, index_path=INDEX_PATH):
+        self.index_path = index_path
+        self.lock = threading.RLock()
+        self.dirs = {}
+        self.hashes = {}
+        self.translated = {}
+        self.dirty = False
+        self.saved = 0.0
+        self.rescanned = 0
+        self.reused = 0
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == INDEX_SURUMU:
+                    self.dirs = data.get('dirs', {})
+                    self.hashes = data.get('hashes', {})
+                    self.translated = data.get('translated', {})
+            except (OSError, ValueError):
+                pass
+
+    def _list_dir(self, path):
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            self.dirs.pop(path, None)
+            return None
+        entry = self.dirs.get(path)
+        if entry is not None and entry['mtime_ns'] == mtime_ns:
+            self.reused += 1
+            return entry
+        subdirs, files = [], {}
+        try:
+            with os.scandir(path) as it:
+                for item in it:
+                    try:
+                        if item.is_dir(follow_symlinks=False):
+                            subdirs.append(item.name)
+                        elif item.is_file():
+                            stat = item.stat()
+                            files[item.name] = [stat.st_size, stat.st_mtime_ns]
+                    except OSError:
+                        continue
+        except OSError:
+            self.dirs.pop(path, None)
+            return None
+        entry = self.dirs[path] = {'mtime_ns': mtime_ns, 'dirs': sorted(subdirs), 'files': files}
+        self.rescanned += 1
+        self.dirty = True
+        return entry
+
+    def walk(self, root, extensions, prune=None):
+        root_abs = os.path.abspath(root)
+        found = []
+        with self.lock:
+            stack = [(root_abs, root)]
+            while stack:
+                path, display_path = stack.pop()
+                entry = self._list_dir(path)
+                if entry is None:
+                    continue
+                for name in entry['files']:
+                    if name.lower().endswith(extensions):
+                        found.append(os.path.join(display_path, name))
+                for name in reversed(entry['dirs']):
+                    if prune is None or not prune(name):
+                        stack.append((os.path.join(path, name), os.path.join(display_path, name)))
+        self.save(force=False)
+        return found
+
+    def stat(self, path):
+        path = os.path.abspath(path)
+        with self.lock:
+            entry = self.dirs.get(os.path.dirname(path))
+            info = entry['files'].get(os.path.basename(path)) if entry else None
+        if info is None:
+            stat = os.stat(path)
+            info = [stat.st_size, stat.st_mtime_ns]
+        return info
+
+    def content_hash(self, path, info=None):
+        path = os.path.abspath(path)
+        size, mtime_ns = info or self.stat(path)
+        with self.lock:
+            cached = self.hashes.get(path)
+            if cached and cached[0] == size and cached[1] == mtime_ns:
+                return cached[2]
+        digest = file_hash(path)
+        with self.lock:
+            self.hashes[path] = [size, mtime_ns, digest]
+            self.dirty = True
+        return digest
+
+    def is_changed(self, path):
+        record = self.translated.get(os.path.abspath(path))
+        if record is None:
+            return True
+        # The file itself is stat'ed: a rewrite in place does not always touch the cached directory entry.
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return True
+        if record['size'] == stat.st_size and record['mtime_ns'] == stat.st_mtime_ns:
+            return False
+        return stat.st_size != record['size'] or self.content_hash(path, (stat.st_size, stat.st_mtime_ns)) != record['hash']
+
+    def changed_since_translation(self, paths):
+        return [path for path in paths if self.is_changed(path)]
+
+    def mark_translated(self, paths):
+        records = {}
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                info = (stat.st_size, stat.st_mtime_ns)
+                records[os.path.abspath(path)] = {'size': info[0], 'mtime_ns': info[1], 'hash': self.content_hash(path, info), 'translated': time.strftime("%Y-%m-%d %H:%M:%S")}
+            except OSError:
+                continue
+        with self.lock:
+            self.translated.update(records)
+            self.dirty = True
+        self.save(force=False)
+
+    def save(self, force=True):
+        # Watch mode marks one image at a time; the index is written at most every few seconds and once at exit.
+        with self.lock:
+            if not self.dirty or (not force and time.monotonic() - self.saved < KAYDETME_ARALIGI_SN):
+                return
+            data = json.dumps({'version': INDEX_SURUMU, 'dirs': self.dirs, 'hashes': self.hashes, 'translated': self.translated})
+            self.dirty = False
+            self.saved = time.monotonic()
+        try:
+            os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+            temp_path = f"{self.index_path}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(temp_path, self.index_path)
+        except OSError:
+            pass
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ScanIndex()
+            atexit.register(_index.save)
+        return _index
@@ -0,0 +1,100 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+KUYRUK_BOYUTU = 8
+EKSIK_SAYFA_MESAJI = "-> Okuma hatası: sayfa arşivde bulunamadı"
+_BITTI = object()
+
+def _missing_page(name):
+    return (False, EKSIK_SAYFA_MESAJI)
+
+def run(names, read_items, preprocess, translate, on_result, max_workers, done=(), queue_size=KUYRUK_BOYUTU, preprocess_workers=1, executor=None, on_missing=_missing_page):
+    index_of = {name: i for i, name in enumerate(names)}
+    pending = [name for name in names if name not in done]
+    read_queue = queue.Queue(maxsize=queue_size)
+    result_queue = queue.Queue()
+    preprocess_workers = max(1, int(preprocess_workers or 1))
+    upload_slots = threading.BoundedSemaphore(max(1, int(max_workers)) + queue_size)
+    stop = threading.Event()
+
+    def reader():
+        produced = set()
+        try:
+            for name, data in read_items(pending):
+                if stop.is_set(): break
+                produced.add(name)
+                read_queue.put((name, data))
+            else:
+                # A page the archive does not actually hold is never read; fail it here, or the run would wait for it forever.
+                for name in pending:
+                    if name not in produced:
+                        result_queue.put((name, on_missing(name)))
+        except Exception as e:
+            result_queue.put((None, e))
+        finally:
+            for _ in range(preprocess_workers):
+                read_queue.put(_BITTI)
+
+    def upload(name, data):
+        try:
+            result = translate(name, data)
+        except Exception as e:
+            result = (False, f"-> Genel Hata: {e}")
+        finally:
+            upload_slots.release()
+        result_queue.put((name, result))
+
+    def preprocessor(executor):
+        while True:
+            item = read_queue.get()
+            if item is _BITTI: break
+            if stop.is_set(): continue
+            name, data = item
+            try:
+                data = preprocess(name, data)
+            except Exception as e:
+                result_queue.put((name, (False, f"-> Sıkıştırma hatası: {e}")))
+                continue
+            if data is None:
+                result_queue.put((name, (False, "-> Sıkıştırma hatası")))
+                continue
+            upload_slots.acquire()
+            executor.submit(upload, name, data)
+
+    received = {}
+    next_index = 0
+
+    def flush():
+        nonlocal next_index
+        while next_index < len(names):
+            name = names[next_index]
+            if name in done:
+                on_result(next_index, name, True, None)
+            elif next_index in received:
+                success, message = received.pop(next_index)
+                on_result(next_index, name, success, message)
+            else:
+                break
+            next_index += 1
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)))
+    threads = [threading.Thread(target=reader, daemon=True)]
+    threads += [threading.Thread(target=preprocessor, args=(executor,), daemon=True) for _ in range(preprocess_workers)]
+    for thread in threads: thread.start()
+    try:
+        outstanding = len(pending)
+        flush()
+        while outstanding:
+            name, result = result_queue.get()
+            if name is None: raise result
+            received[index_of[name]] = result
+            outstanding -= 1
+            flush()
+        for thread in threads[1:]: thread.join()
+    finally:
+        stop.set()
+        if own_executor:
+            executor.shutdown(wait=True)
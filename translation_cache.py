@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import hashlib
+import threading
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+CACHE_DIR = ".translation_cache"
+VARSAYILAN_CACHE_BOYUTU_MB = 2048
+KAYDETME_ARALIGI_SN = 5.0
+
+def _atomic_write(path, data):
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+class TranslationCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_size_mb=VARSAYILAN_CACHE_BOYUTU_MB):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.lock_path = os.path.join(cache_dir, "index.lock")
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.corrupted = 0
+        self.dirty = False
+        self.saved = time.monotonic()
+        self.removed = set()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = self._read_index()
+        self.total_size = sum(entry['size'] for entry in self.index.values())
+
+    def _read_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def make_key(data, translator, target_lang, font):
+        digest = hashlib.sha256(data)
+        digest.update(f"\0{translator}\0{target_lang}\0{font}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.jpg")
+
+    def _drop(self, key):
+        entry = self.index.pop(key, None)
+        if entry:
+            self.total_size -= entry['size']
+        self.removed.add(key)
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
+        self.dirty = True
+
+    def get(self, key):
+        with self.lock:
+            entry = self.index.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            try:
+                with open(self._entry_path(key), 'rb') as f:
+                    content = f.read()
+            except OSError:
+                content = None
+            if content is None or hashlib.sha256(content).hexdigest() != entry['sha256']:
+                self.corrupted += 1
+                self.misses += 1
+                self._drop(key)
+                return None
+            entry['last_used'] = time.time()
+            self.hits += 1
+            self.dirty = True
+            return content
+
+    def put(self, key, content):
+        if len(content) > self.max_size_bytes:
+            return
+        entry_path = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        _atomic_write(entry_path, content)
+        with self.lock:
+            if key in self.index:
+                self.total_size -= self.index[key]['size']
+            self.index[key] = {'size': len(content), 'sha256': hashlib.sha256(content).hexdigest(), 'last_used': time.time()}
+            self.removed.discard(key)
+            self.total_size += len(content)
+            self.dirty = True
+            self._evict()
+            if time.monotonic() - self.saved >= KAYDETME_ARALIGI_SN:
+                self._save_index()
+
+    def _evict(self):
+        if self.total_size <= self.max_size_bytes:
+            return
+        for key, _ in sorted(self.index.items(), key=lambda item: item[1]['last_used']):
+            if self.total_size <= self.max_size_bytes:
+                break
+            self._drop(key)
+            self.evictions += 1
+
+    def _save_index(self):
+        # Other processes (a CLI run next to the daemon) share the directory: their entries are merged in
+        # under a file lock instead of being overwritten, so their blobs stay counted and evictable.
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self.lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                for key, entry in self._read_index().items():
+                    if key in self.removed:
+                        continue
+                    current = self.index.get(key)
+                    if current is None:
+                        if os.path.exists(self._entry_path(key)):
+                            self.index[key] = entry
+                            self.total_size += entry['size']
+                    elif entry['last_used'] > current['last_used']:
+                        current['last_used'] = entry['last_used']
+                self._evict()
+                _atomic_write(self.index_path, json.dumps(self.index).encode('utf-8'))
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        self.removed.clear()
+        self.dirty = False
+        self.saved = time.monotonic()
+
+    def flush(self):
+        with self.lock:
+            if self.dirty:
+                self._save_index()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'corrupted': self.corrupted,
+                'entries': len(self.index),
+                'size_mb': self.total_size / (1024 * 1024),
+            }
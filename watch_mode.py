@@ -0,0 +1,316 @@
+import os
+import sys
+import time
+import select
+import signal
+import struct
+import threading
+import ctypes
+import ctypes.util
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+import core_logic
+import archive_mode
+import batch_mode
+import cli_mode
+import daemon_mode
+import failures
+import job_journal
+import key_pool
+import scan_index
+
+YERLESME_SN = 1.0
+YOKLAMA_ARALIGI_SN = 2.0
+GECICI_UZANTILAR = ('.part', '.partial', '.crdownload', '.download', '.tmp', '.!qb')
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+IZLEME_MASKESI = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+OLAY_BASLIGI = struct.Struct('iIII')
+
+def _skip_watch_dir(name):
+    return name.startswith('.') or core_logic._skip_image_dir(name)
+
+def is_candidate(path):
+    name = os.path.basename(path)
+    return not name.startswith('.') and not name.lower().endswith(GECICI_UZANTILAR) and daemon_mode.detect_kind(path) in ('image', 'archive')
+
+def walk_files(root, ignore):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [name for name in dirnames if not _skip_watch_dir(name) and os.path.abspath(os.path.join(dirpath, name)) not in ignore]
+        for name in filenames:
+            yield os.path.join(dirpath, name)
+
+class InotifyWatcher:
+    backend = 'inotify'
+
+    def __init__(self, root, ignore):
+        self.root = root
+        self.ignore = ignore
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        self.dirs = {}
+        self.touched = set()
+        try:
+            self._add_tree(root, strict=True)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_tree(self, path, strict=False):
+        # Directories are watched before they are listed, so a file created in between is reported either way.
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = [name for name in dirnames if not _skip_watch_dir(name) and os.path.abspath(os.path.join(dirpath, name)) not in self.ignore]
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), IZLEME_MASKESI)
+            if wd < 0:
+                if strict:
+                    raise OSError(ctypes.get_errno(), f"{os.strerror(ctypes.get_errno())}: {dirpath}")
+                continue
+            self.dirs[wd] = dirpath
+            self.touched.update(os.path.join(dirpath, name) for name in filenames)
+
+    def poll(self, timeout):
+        if not self.touched:
+            select.select([self.fd], [], [], timeout)
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = OLAY_BASLIGI.unpack_from(data, offset)
+                name = os.fsdecode(data[offset + OLAY_BASLIGI.size:offset + OLAY_BASLIGI.size + length].rstrip(b'\0'))
+                offset += OLAY_BASLIGI.size + length
+                if mask & IN_Q_OVERFLOW:
+                    self.touched.update(walk_files(self.root, self.ignore))
+                    continue
+                if mask & IN_IGNORED:
+                    self.dirs.pop(wd, None)
+                    continue
+                parent = self.dirs.get(wd)
+                if parent is None or not name:
+                    continue
+                path = os.path.join(parent, name)
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO) and not _skip_watch_dir(name) and os.path.abspath(path) not in self.ignore:
+                        self._add_tree(path)
+                else:
+                    self.touched.add(path)
+        touched, self.touched = self.touched, set()
+        return touched
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+class PollingWatcher:
+    backend = 'polling'
+
+    def __init__(self, root, ignore, interval=YOKLAMA_ARALIGI_SN):
+        self.root = root
+        self.ignore = ignore
+        self.interval = interval
+        self.snapshot = {}
+        self.scanned = 0.0
+
+    def poll(self, timeout):
+        wait = self.scanned + self.interval - time.monotonic()
+        if wait > 0:
+            time.sleep(min(wait, timeout))
+            if wait > timeout:
+                return set()
+        self.scanned = time.monotonic()
+        snapshot, touched = {}, set()
+        for path in walk_files(self.root, self.ignore):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+            if self.snapshot.get(path) != snapshot[path]:
+                touched.add(path)
+        self.snapshot = snapshot
+        return touched
+
+    def close(self):
+        pass
+
+def open_watcher(root, ignore, polling, interval, lang):
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(root, ignore)
+        except (OSError, AttributeError) as e:
+            print(lang.get('WARN_WATCH_POLLING', '...').format(error=e, interval=interval))
+    return PollingWatcher(root, ignore, interval)
+
+class SettleTracker:
+    # A file counts as written once its size and mtime have not moved for settle_seconds; half-copied files keep resetting the clock.
+    def __init__(self, settle_seconds=YERLESME_SN):
+        self.settle_seconds = settle_seconds
+        self.pending = {}
+
+    def touch(self, path, now):
+        entry = self.pending.setdefault(path, {'stat': None, 'changed': now, 'seen': now})
+        entry['changed'] = now
+
+    def ready(self, now):
+        ready = []
+        for path, entry in list(self.pending.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self.pending[path]
+                continue
+            current = (stat.st_size, stat.st_mtime_ns)
+            if current != entry['stat']:
+                entry['stat'], entry['changed'] = current, now
+            elif stat.st_size > 0 and now - entry['changed'] >= self.settle_seconds:
+                ready.append((path, entry['seen']))
+                del self.pending[path]
+        return ready
+
+class FolderWatch:
+    def __init__(self, root, settings, lang, profile, job_count, image_output):
+        self.root = root
+        self.settings = settings
+        self.lang = lang
+        self.profile = profile
+        self.image_output = image_output
+        self.tracker = SettleTracker(float(profile.get('watch_settle_seconds', YERLESME_SN)))
+        self.upload_executor = ThreadPoolExecutor(max_workers=max(1, settings['workers']))
+        self.job_executor = ThreadPoolExecutor(max_workers=max(1, int(job_count)))
+        self.cache = None
+        self.journal = None
+        self.inflight = {}
+        self.summaries = []
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def open_journal(self):
+        # Loose images share one folder journal for the watched tree, so their failures can be re-driven like any folder job.
+        self.journal = job_journal.JobJournal.create('folder', self.root, self.settings['model'], self.settings['target_lang'], self.image_output)
+        failures.register_job(os.path.join(self.image_output, "error"), self.journal)
+
+    def run_image_job(self, path):
+        relative_path = os.path.relpath(path, self.root)
+        self.journal.add_images([relative_path])
+        settings = self.settings
+        summary = cli_mode.run_image_job(path, settings['api_key'], settings['model'], settings['target_lang'], self.lang, self.image_output, self.cache, self.root)
+        self.journal.set_state(relative_path, job_journal.CEVRILDI if summary['translated'] else job_journal.BASARISIZ)
+        return summary
+
+    def dispatch(self, path, seen):
+        if not scan_index.get_index().is_changed(path):
+            return
+        kind = daemon_mode.detect_kind(path)
+        print(self.lang.get('INFO_WATCH_FILE_READY', '...').format(kind=kind, path=path))
+        settings = self.settings
+        if kind == 'image':
+            future = self.upload_executor.submit(self.run_image_job, path)
+        else:
+            future = self.job_executor.submit(batch_mode.run_job, {'path': path, 'kind': kind}, settings, self.lang, self.cache, self.upload_executor)
+        with self.lock:
+            self.inflight[path] = future
+        future.add_done_callback(lambda done: self.finished(path, seen, done))
+
+    def finished(self, path, seen, future):
+        try:
+            summary = future.result()
+        except Exception as e:
+            summary = {'source': path, 'kind': daemon_mode.detect_kind(path), 'pages': 0, 'translated': 0, 'failed': 0, 'skipped': 0, 'output': None, 'status': 'error', 'seconds': round(time.time() - seen, 2), 'error': str(e)}
+            print(self.lang.get('ERROR_BATCH_JOB_FAILED', '...').format(source=path, error=e))
+        finally:
+            with self.lock:
+                self.inflight.pop(path, None)
+        with self.lock:
+            self.summaries.append(summary)
+        print(self.lang.get('INFO_WATCH_FILE_DONE', '...').format(latency=time.time() - seen, **summary))
+
+    def run(self, watcher):
+        while not self.stopped.is_set():
+            touched = watcher.poll(0.2 if self.tracker.pending else 1.0)
+            now = time.time()
+            for path in touched:
+                if is_candidate(path):
+                    self.tracker.touch(path, now)
+            for path, seen in self.tracker.ready(now):
+                with self.lock:
+                    busy = path in self.inflight
+                if busy:
+                    # Rewritten while its previous version is still being translated; pick it up again afterwards.
+                    self.tracker.touch(path, now)
+                else:
+                    self.dispatch(path, seen)
+
+    def stop(self):
+        self.job_executor.shutdown(wait=True)
+        self.upload_executor.shutdown(wait=True)
+
+def start_watch(args, lang, profile):
+    print(f"--- {lang.get('HEADER_WATCH', '---')} ---")
+    root = os.path.normpath(args.watch)
+    if not os.path.isdir(root):
+        print(lang.get('ERROR_WATCH_NO_FOLDER', '...').format(path=root)); return 1
+    core_logic.configure_upload_encoder(profile)
+    model = args.model or profile.get('model_name')
+    if not model:
+        print(lang.get('ERROR_BATCH_NO_MODEL', '...')); return 1
+    load_dotenv(dotenv_path="api.env")
+    api_key = args.api_key or os.getenv("API_KEY") or key_pool.default_key(profile)
+    if not api_key:
+        print(lang.get('ERROR_BATCH_NO_API_KEY', '...')); return 1
+
+    workers = int(args.workers or profile.get('max_workers', core_logic.ESZAMANLI_ISTEK_SAYISI))
+    settings = {
+        'model': model,
+        'target_lang': args.target_lang or profile.get('target_language') or "en",
+        'api_key': api_key,
+        'workers': workers,
+        'profile': profile,
+        'output_dir': args.output_dir or archive_mode.ARCHIVE_OUTPUT_DIR,
+        'skip_blank': profile.get('skip_blank_pages', True),
+        'skip_duplicates': profile.get('skip_duplicate_pages', True),
+    }
+    image_output = args.output_dir or f"{root}_output"
+    ignore = {os.path.abspath(path) for path in (settings['output_dir'], image_output, archive_mode.ARCHIVE_WORK_DIR)}
+    interval = float(profile.get('watch_poll_interval', YOKLAMA_ARALIGI_SN))
+    watcher = open_watcher(root, ignore, args.poll, interval, lang)
+
+    core_logic.configure_api(profile, workers)
+    watch = FolderWatch(root, settings, lang, profile, args.jobs or batch_mode.ESZAMANLI_IS_SAYISI, image_output)
+    watch.cache = core_logic.open_translation_cache(profile)
+    core_logic.open_metrics(profile)
+    core_logic.open_key_pool(profile, api_key, lang)
+    core_logic.open_output_encoder(profile, lang)
+    core_logic.open_failures(profile)
+    watch.open_journal()
+    signal.signal(signal.SIGTERM, lambda signum, frame: watch.stopped.set())
+    print(lang.get('INFO_WATCH_STARTED', '...').format(path=root, backend=watcher.backend, images=image_output, archives=settings['output_dir']))
+    try:
+        watch.run(watcher)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        print(lang.get('INFO_WATCH_STOPPING', '...'))
+        watch.stop()
+        watch.journal.complete()
+    summaries = watch.summaries
+    print(lang.get('INFO_BATCH_TOTALS', '...').format(jobs=len(summaries), translated=sum(summary['translated'] for summary in summaries), failed=sum(summary['failed'] for summary in summaries)))
+    core_logic.close_output_encoder(lang)
+    core_logic.close_key_pool(lang)
+    core_logic.print_cache_stats(watch.cache, lang)
+    core_logic.close_metrics(lang)
+    core_logic.close_failures(lang)
+    return 0